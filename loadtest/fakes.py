@@ -0,0 +1,280 @@
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+from typing import Optional
+
+# Discord-like per-route rate limits: bucket name -> (requests, per seconds).
+RATE_LIMITS = {
+    "interaction": (50, 1),
+    "channel_messages": (5, 5),
+    "reactions": (1, 0.25),
+    "history": (5, 5),
+    "threads": (10, 10),
+    "objects": (50, 1),
+}
+
+snowflakes = itertools.count(1_000_000_000_000_000)
+
+
+class TokenBucket:
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.refill_rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def wait_time(self) -> float:
+        """
+        Takes a token, returning how long the caller must wait for it (0 if one was available).
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / self.refill_rate
+
+
+class FakeDiscordRest:
+    """
+    Stands in for Discord's REST API. Every call sleeps for a simulated latency, waits on a per-route rate-limit bucket
+    like the real client's rate limiter would, and is counted against the command currently being run.
+    """
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02):
+        self.latency = latency
+        self.jitter = jitter
+        self.buckets: dict[tuple, TokenBucket] = {}
+        self.calls: Counter = Counter()
+        self.rate_limited: Counter = Counter()
+
+    async def request(self, route: str, bucket: str, bucket_key=None):
+        self.calls[route] += 1
+
+        bucket_id = (bucket, bucket_key)
+        if bucket_id not in self.buckets:
+            self.buckets[bucket_id] = TokenBucket(*RATE_LIMITS[bucket])
+        wait_time = self.buckets[bucket_id].wait_time()
+        if wait_time > 0:
+            self.rate_limited[route] += 1
+            await asyncio.sleep(wait_time)
+
+        await asyncio.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+
+    def reset_counts(self):
+        self.calls.clear()
+        self.rate_limited.clear()
+
+
+class FakeUser:
+    def __init__(self, name: str):
+        self.id = next(snowflakes)
+        self.username = name
+        self.mention = f"<@{self.id}>"
+
+    def __eq__(self, other):
+        return isinstance(other, FakeUser) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeEmoji:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeReaction:
+    def __init__(self, emoji: str, me: bool):
+        self.emoji = FakeEmoji(emoji)
+        self.count = 1
+        self.me = me
+
+
+class FakeRole:
+    def __init__(self, role_id):
+        self.id = role_id
+        self.mention = f"<@&{role_id}>"
+
+
+class FakeGuild:
+    def __init__(self, rest: FakeDiscordRest, guild_id):
+        self.rest = rest
+        self.id = guild_id
+        self.name = f"Guild {guild_id}"
+
+    async def fetch_role(self, role_id, *, force: bool = False) -> FakeRole:
+        await self.rest.request("GET /guilds/{guild}/roles", "objects", self.id)
+        return FakeRole(role_id)
+
+
+class FakeMessage:
+    def __init__(self, rest: FakeDiscordRest, channel: "FakeChannel", author: FakeUser, content: Optional[str] = None,
+                 embeds=None, components=None):
+        self.rest = rest
+        self.id = next(snowflakes)
+        self.channel = channel
+        self.author = author
+        self.content = content or ""
+        self.embeds = embeds if isinstance(embeds, list) else ([embeds] if embeds else [])
+        self.components = components
+        self.reactions: list[FakeReaction] = []
+
+    def __int__(self):
+        return self.id
+
+    async def edit(self, content=None, embed=None, embeds=None, components=None, **kwargs):
+        await self.rest.request("PATCH /channels/{channel}/messages/{message}", "channel_messages", self.channel.id)
+        self.update(content, embed or embeds, components)
+        return self
+
+    def update(self, content=None, embeds=None, components=None):
+        if content is not None:
+            self.content = content
+        if embeds is not None:
+            self.embeds = embeds if isinstance(embeds, list) else [embeds]
+        if components is not None:
+            self.components = components
+
+    async def add_reaction(self, emoji: str):
+        await self.rest.request("PUT /channels/{channel}/messages/{message}/reactions", "reactions", self.channel.id)
+        self.react(emoji, me=True)
+
+    async def create_reaction(self, emoji: str):
+        await self.add_reaction(emoji)
+
+    async def remove_reaction(self, emoji):
+        await self.rest.request("DELETE /channels/{channel}/messages/{message}/reactions", "reactions", self.channel.id)
+        emoji_name = getattr(emoji, "name", emoji)
+        self.reactions = [reaction for reaction in self.reactions
+                          if not (reaction.me and reaction.emoji.name == emoji_name)]
+
+    def react(self, emoji: str, me: bool = False):
+        for reaction in self.reactions:
+            if reaction.emoji.name == emoji:
+                reaction.count += 1
+                reaction.me = reaction.me or me
+                return
+        self.reactions.append(FakeReaction(emoji, me))
+
+
+class FakeHistory:
+    """
+    Mimics the client's ChannelHistory: async iterable and flattenable, fetching 100 messages per request.
+    """
+    def __init__(self, channel: "FakeChannel", limit: int, before=None):
+        self.channel = channel
+        self.limit = limit
+        self.before = before
+
+    async def flatten(self) -> list[FakeMessage]:
+        return [message async for message in self]
+
+    async def __aiter__(self):
+        messages = [message for message in reversed(self.channel.messages)
+                    if self.before is None or message.id < int(self.before)][:self.limit]
+        for index, message in enumerate(messages):
+            if index % 100 == 0:
+                await self.channel.rest.request("GET /channels/{channel}/messages", "history", self.channel.id)
+            yield message
+
+
+class FakeChannel:
+    def __init__(self, rest: FakeDiscordRest, bot_user: FakeUser, channel_id=None, name: str = "general"):
+        self.rest = rest
+        self.bot_user = bot_user
+        self.id = channel_id or next(snowflakes)
+        self.name = name
+        self.messages: list[FakeMessage] = []
+        self.threads: list[FakeChannel] = []
+
+    def history(self, limit: int = 100, before=None) -> FakeHistory:
+        return FakeHistory(self, limit, before)
+
+    async def fetch_message(self, message_id, *, force: bool = False) -> Optional[FakeMessage]:
+        await self.rest.request("GET /channels/{channel}/messages/{message}", "objects", self.id)
+        return next((message for message in self.messages if message.id == int(message_id)), None)
+
+    async def send(self, content=None, embed=None, embeds=None, components=None, **kwargs) -> FakeMessage:
+        await self.rest.request("POST /channels/{channel}/messages", "channel_messages", self.id)
+        return self.post(FakeMessage(self.rest, self, self.bot_user, content, embed or embeds, components))
+
+    def post(self, message: FakeMessage) -> FakeMessage:
+        self.messages.append(message)
+        return message
+
+    async def create_thread(self, name: str, message=None, **kwargs) -> "FakeChannel":
+        await self.rest.request("POST /channels/{channel}/threads", "threads", self.id)
+        thread = FakeChannel(self.rest, self.bot_user, name=name)
+        self.threads.append(thread)
+        return thread
+
+
+class FakeSlashContext:
+    """
+    Stands in for SlashContext. The first response is the interaction callback; later ones are webhook followups.
+    """
+    def __init__(self, rest: FakeDiscordRest, client, channel: FakeChannel, guild_id, author: FakeUser):
+        self.rest = rest
+        self.client = client
+        self.bot = client
+        self.channel = channel
+        self.guild_id = guild_id
+        self.author = author
+        self.deferred = False
+        self.responded = False
+
+    async def defer(self, ephemeral: bool = False, **kwargs):
+        await self.rest.request("POST /interactions/{id}/{token}/callback", "interaction")
+        self.deferred = True
+
+    async def send(self, content=None, embed=None, embeds=None, ephemeral: bool = False, **kwargs) -> FakeMessage:
+        if self.deferred or self.responded:
+            await self.rest.request("POST /webhooks/{application}/{token}", "interaction")
+        else:
+            await self.rest.request("POST /interactions/{id}/{token}/callback", "interaction")
+        self.responded = True
+
+        message = FakeMessage(self.rest, self.channel, self.client.user, content, embed or embeds)
+        if not ephemeral:
+            self.channel.post(message)
+        return message
+
+    async def edit(self, message: FakeMessage, content=None, embed=None, embeds=None, **kwargs) -> FakeMessage:
+        await self.rest.request("PATCH /webhooks/{application}/{token}/messages/{message}", "interaction")
+        message.update(content, embed or embeds)
+        return message
+
+
+class FakeDiscord:
+    """
+    Patches a Client so that everything the extensions fetch through it comes from fake, in-process guilds and channels.
+    """
+    def __init__(self, client, rest: FakeDiscordRest):
+        self.client = client
+        self.rest = rest
+        self.bot_user = FakeUser("FreshCutGrass")
+        self.channels: dict[str, FakeChannel] = {}
+        self.guilds: dict[str, FakeGuild] = {}
+
+        client._user = self.bot_user
+        client.fetch_channel = self.fetch_channel
+        client.fetch_guild = self.fetch_guild
+
+    async def fetch_channel(self, channel_id, *, force: bool = False) -> FakeChannel:
+        await self.rest.request("GET /channels/{channel}", "objects")
+        return self.get_channel(channel_id)
+
+    async def fetch_guild(self, guild_id, *, force: bool = False) -> FakeGuild:
+        await self.rest.request("GET /guilds/{guild}", "objects")
+        if guild_id not in self.guilds:
+            self.guilds[guild_id] = FakeGuild(self.rest, guild_id)
+        return self.guilds[guild_id]
+
+    def get_channel(self, channel_id) -> FakeChannel:
+        if channel_id not in self.channels:
+            self.channels[channel_id] = FakeChannel(self.rest, self.bot_user, channel_id)
+        return self.channels[channel_id]
+
+    def new_context(self, guild_id, channel_id) -> FakeSlashContext:
+        return FakeSlashContext(self.rest, self.client, self.get_channel(channel_id), guild_id, FakeUser("Player"))
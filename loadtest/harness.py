@@ -0,0 +1,238 @@
+"""
+Offline load test for the bot's extensions.
+
+Drives the slash command callbacks of WikidotExtension, PollsExtension and CalendarExtension against an in-process fake
+Discord REST layer (simulated latency and rate-limit buckets) and recorded Wikidot/Google Calendar responses, then
+reports throughput, tail latency and API calls per command. Exits with status 1 if any command exceeds its call budget.
+
+    python loadtest/harness.py --requests 200 --concurrency 20 --guilds 5
+    python loadtest/harness.py --commands spell_lookup item_lookup --cold-caches
+    python loadtest/harness.py --record --pages spell:fireball wondrous-items:bag-of-holding
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main"))
+
+from interactions import Client  # noqa: E402
+
+from fakes import FakeDiscord, FakeDiscordRest  # noqa: E402
+from replay import CalendarReplay, WikidotReplay, record_calendar_events, record_wikidot_pages  # noqa: E402
+
+# The maximum average calls per invocation for each command: {command: {upstream: calls}}.
+CALL_BUDGETS = {
+    "spell_lookup": {"discord": 2, "wikidot": 1},
+    "item_lookup": {"discord": 2, "wikidot": 5},
+    "spell_compare": {"discord": 2, "wikidot": 3},
+    "spell_search": {"discord": 1, "wikidot": 0},
+    "multipoll": {"discord": 18, "wikidot": 0},
+    "schedule": {"discord": 48, "wikidot": 0},
+    "multipoll_results": {"discord": 12, "wikidot": 0},
+    "remind_me": {"discord": 8, "calendar": 1},
+}
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.rest = FakeDiscordRest(latency=args.discord_latency_ms / 1000)
+        self.wikidot = WikidotReplay(latency=args.wikidot_latency_ms / 1000)
+        self.calendar = CalendarReplay(latency=args.calendar_latency_ms / 1000)
+
+        # Keep the shared cache out of the working directory, so runs start from nothing and don't affect the bot.
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        os.environ["SHARED_CACHE_FILE"] = os.path.join(self.temporary_directory.name, "shared_cache.sqlite3")
+        os.environ["PARSE_WORKERS"] = str(args.parse_workers)
+        # Without --admission every request runs, so call counts reflect the commands rather than rejections.
+        os.environ["ADMISSION_CONTROL"] = "true" if args.admission else "false"
+
+        self.client = Client()
+        for extension in ["wikidot_scraper", "polls", "dnd_calendar"]:
+            self.client.load_extension(extension)
+        self.discord = FakeDiscord(self.client, self.rest)
+
+        # Swap the upstreams for their recorded stand-ins.
+        import dnd_calendar
+        import wikidot_scraper
+        wikidot_scraper.get_wikidot_html = self.wikidot.get_wikidot_html
+        dnd_calendar.GoogleCalendar.get_todays_events = staticmethod(self.calendar.get_todays_events)
+
+        recorded_paths = self.wikidot.recorded_paths()
+        self.spell_names = [path.split(':', 1)[1].replace('-', ' ') for path in recorded_paths
+                            if path.startswith("spell:")] + ["Misspeled Spell"]
+        self.item_names = [path.split(':', 1)[1].replace('-', ' ') for path in recorded_paths
+                           if not path.startswith("spell:")] + ["Misspeled Item"]
+
+        self.guild_ids = [str(1000 + guild) for guild in range(args.guilds)]
+        # Each guild's commands run in one channel, which starts out named after the guild.
+        self.channel_by_guild = {guild_id: guild_id for guild_id in self.guild_ids}
+
+    def extension(self, name: str):
+        return self.client.get_ext(name)
+
+    async def invoke(self, command: str, ctx):
+        wikidot = self.extension("WikidotExtension")
+        polls = self.extension("PollsExtension")
+        calendar = self.extension("CalendarExtension")
+
+        match command:
+            case "spell_lookup":
+                await wikidot.spell_lookup.callback(ctx, spell_name=random.choice(self.spell_names))
+            case "item_lookup":
+                await wikidot.item_lookup.callback(ctx, item_name=random.choice(self.item_names))
+            case "spell_compare":
+                await wikidot.spell_compare.callback(ctx, spell_names=", ".join(random.sample(self.spell_names, 2)))
+            case "spell_search":
+                await wikidot.spell_search.callback(ctx, query=random.choice(["damage", "dart force", "fire"]))
+            case "multipoll":
+                await polls.multipoll.callback(ctx, question="Which one?", options="Red Green Blue")
+            case "schedule":
+                await polls.schedule.callback(ctx, question="When are we playing?")
+            case "multipoll_results":
+                await polls.multipoll_results.callback(ctx, ranking_mode="SCORE")
+            case "remind_me":
+                await calendar.remind_me.callback(ctx)
+
+    async def prepare(self, command: str):
+        if self.args.cold_caches:
+            import wikidot_scraper
+            wikidot_scraper.page_cache.entries.clear()
+            wikidot_scraper.missing_page_cache.entries.clear()
+            wikidot_scraper.item_category_by_name.clear()
+            wikidot_scraper.SHARED_CACHE.clear_lookups()
+
+        if command == "multipoll_results":
+            # Results are ranked from inside a poll's thread, so post a poll with some votes for every guild.
+            for guild_id in self.guild_ids:
+                ctx = self.discord.new_context(guild_id, self.channel_by_guild[guild_id])
+                await self.invoke("multipoll", ctx)
+                thread = ctx.channel.threads[-1]
+                self.discord.channels[thread.id] = thread
+                self.channel_by_guild[guild_id] = thread.id
+                for message in thread.messages[:-1]:
+                    for _ in range(random.randint(0, 3)):
+                        message.react(random.choice(["🍏", "🤨", "🥶", "🚫"]))
+        if command == "spell_search":
+            # Searches only see spells that have been looked up.
+            for spell_name in self.spell_names:
+                ctx = self.discord.new_context(self.guild_ids[0], self.channel_by_guild[self.guild_ids[0]])
+                await self.invoke("spell_lookup", ctx)
+
+    async def run_phase(self, command: str) -> dict:
+        await self.prepare(command)
+        self.rest.reset_counts()
+        wikidot_calls, calendar_calls = self.wikidot.calls, self.calendar.calls
+
+        latencies = []
+        errors = 0
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def run_request(request_number: int):
+            nonlocal errors
+            guild_id = self.guild_ids[request_number % len(self.guild_ids)]
+            async with semaphore:
+                ctx = self.discord.new_context(guild_id, self.channel_by_guild[guild_id])
+                start = time.perf_counter()
+                try:
+                    await self.invoke(command, ctx)
+                except Exception as error:
+                    errors += 1
+                    logging.getLogger(__name__).debug("%s failed: %r", command, error)
+                latencies.append(time.perf_counter() - start)
+
+        phase_start = time.perf_counter()
+        await asyncio.gather(*[run_request(request_number) for request_number in range(self.args.requests)])
+        duration = time.perf_counter() - phase_start
+
+        latencies.sort()
+        return {
+            "command": command,
+            "requests": len(latencies),
+            "throughput": len(latencies) / duration,
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1],
+            "errors": errors,
+            "discord": sum(self.rest.calls.values()) / len(latencies),
+            "rate_limited": sum(self.rest.rate_limited.values()),
+            "wikidot": (self.wikidot.calls - wikidot_calls) / len(latencies),
+            "calendar": (self.calendar.calls - calendar_calls) / len(latencies),
+        }
+
+
+def percentile(sorted_values: [float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def check_budgets(results: [dict]) -> [str]:
+    violations = []
+    for result in results:
+        for upstream, budget in CALL_BUDGETS.get(result["command"], {}).items():
+            if result[upstream] > budget:
+                violations.append(f"{result['command']}: {result[upstream]:.2f} {upstream} calls per request "
+                                  f"(budget {budget})")
+    return violations
+
+
+def print_report(results: [dict]):
+    header = f"{'command':<18}{'reqs':>6}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}" \
+             f"{'errors':>8}{'discord':>9}{'429s':>6}{'wikidot':>9}{'calendar':>10}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(f"{result['command']:<18}{result['requests']:>6}{result['throughput']:>8.1f}"
+              f"{result['p50'] * 1000:>9.0f}{result['p95'] * 1000:>9.0f}{result['p99'] * 1000:>9.0f}"
+              f"{result['max'] * 1000:>9.0f}{result['errors']:>8}{result['discord']:>9.2f}"
+              f"{result['rate_limited']:>6}{result['wikidot']:>9.2f}{result['calendar']:>10.2f}")
+
+
+async def run(args) -> int:
+    load_test = LoadTest(args)
+    results = [await load_test.run_phase(command) for command in args.commands]
+    print_report(results)
+
+    latencies = [result["p95"] for result in results]
+    print(f"\nMedian p95 across commands: {statistics.median(latencies) * 1000:.0f}ms")
+
+    violations = check_budgets(results)
+    for violation in violations:
+        print(f"CALL BUDGET EXCEEDED - {violation}")
+    return 1 if violations else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", nargs="+", default=list(CALL_BUDGETS), choices=list(CALL_BUDGETS))
+    parser.add_argument("--requests", type=int, default=100, help="Requests per command.")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--guilds", type=int, default=3)
+    parser.add_argument("--discord-latency-ms", type=float, default=50)
+    parser.add_argument("--wikidot-latency-ms", type=float, default=300)
+    parser.add_argument("--calendar-latency-ms", type=float, default=200)
+    parser.add_argument("--cold-caches", action="store_true", help="Clear the Wikidot caches before each command.")
+    parser.add_argument("--parse-workers", type=int, default=0, help="Parse large Wikidot pages in worker processes.")
+    parser.add_argument("--admission", action="store_true", help="Rate limit and queue commands as the bot would.")
+    parser.add_argument("--record", action="store_true", help="Record live upstream responses instead of testing.")
+    parser.add_argument("--pages", nargs="*", default=[], help="Wikidot page paths to record, e.g. spell:fireball.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.record:
+        record_wikidot_pages(args.pages)
+        record_calendar_events()
+        return
+
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
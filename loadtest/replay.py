@@ -0,0 +1,91 @@
+import json
+import os
+import random
+import threading
+import time
+from urllib.error import HTTPError
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+WIKIDOT_RECORDINGS_DIR = os.path.join(RECORDINGS_DIR, "wikidot")
+CALENDAR_RECORDING = os.path.join(RECORDINGS_DIR, "calendar_events.json")
+
+
+def recording_file_name(page_path: str) -> str:
+    # Wikidot paths contain colons, which aren't allowed in Windows file names.
+    return page_path.replace(':', '__') + ".html"
+
+
+class WikidotReplay:
+    """
+    Serves recorded Wikidot pages in place of wikidot_scraper.get_wikidot_html. Unrecorded pages return a 404, like a
+    misspelled name would. Runs on the scraper's worker threads, so latency is simulated with a blocking sleep.
+    """
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, recordings_dir: str = WIKIDOT_RECORDINGS_DIR):
+        self.latency = latency
+        self.jitter = jitter
+        self.recordings_dir = recordings_dir
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def recorded_paths(self) -> [str]:
+        if not os.path.isdir(self.recordings_dir):
+            return []
+        return [file_name[:-len(".html")].replace('__', ':')
+                for file_name in sorted(os.listdir(self.recordings_dir)) if file_name.endswith(".html")]
+
+    def get_wikidot_html(self, page_path: str) -> bytes:
+        with self.lock:
+            self.calls += 1
+        time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+
+        recording = os.path.join(self.recordings_dir, recording_file_name(page_path))
+        if not os.path.exists(recording):
+            raise HTTPError(page_path, 404, "Not Found", None, None)
+        with open(recording, 'rb') as recording_file:
+            return recording_file.read()
+
+
+class CalendarReplay:
+    """
+    Serves recorded events in place of GoogleCalendar.get_todays_events. Like the real client, this blocks the caller.
+    """
+    def __init__(self, latency: float = 0.2, recording: str = CALENDAR_RECORDING):
+        self.latency = latency
+        with open(recording) as recording_file:
+            self.events = json.load(recording_file)
+        self.calls = 0
+
+    def get_todays_events(self) -> [dict]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self.events
+
+
+def record_wikidot_pages(page_paths: [str], recordings_dir: str = WIKIDOT_RECORDINGS_DIR):
+    """
+    Fetches live Wikidot pages and saves them for replay.
+    """
+    import wikidot_scraper
+
+    os.makedirs(recordings_dir, exist_ok=True)
+    for page_path in page_paths:
+        try:
+            html = wikidot_scraper.get_wikidot_html(page_path)
+        except HTTPError as error:
+            print(f"Skipping {page_path}: {error}")
+            continue
+        with open(os.path.join(recordings_dir, recording_file_name(page_path)), 'wb') as recording_file:
+            recording_file.write(html)
+        print(f"Recorded {page_path}")
+
+
+def record_calendar_events(recording: str = CALENDAR_RECORDING):
+    """
+    Fetches today's live Google Calendar events and saves them for replay.
+    """
+    from dnd_calendar import GoogleCalendar
+
+    events = GoogleCalendar.get_todays_events() or []
+    with open(recording, 'w') as recording_file:
+        json.dump(events, recording_file, indent=2)
+    print(f"Recorded {len(events)} calendar events")
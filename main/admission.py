@@ -0,0 +1,232 @@
+import asyncio
+import functools
+import logging
+import math
+import os
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Optional
+
+from interactions import SlashContext
+
+import metrics
+import utils
+from bot_logging import fields
+
+logger = logging.getLogger(__name__)
+
+# (capacity, seconds to refill completely) of the token buckets. A command costs its `cost` in tokens from both its
+# guild's and its user's bucket, so one user can't use up a guild's budget and one guild can't use up the bot's.
+GUILD_BUCKET = (30, 60)
+USER_BUCKET = (10, 60)
+# Buckets unused for this long are full again, so they're dropped.
+BUCKET_IDLE_SECONDS = 60
+MAX_TRACKED_BUCKETS = 10000
+
+# Admitted commands that may run at once. The rest wait their turn, taken one guild at a time.
+MAX_RUNNING_COMMANDS = 8
+# Commands each guild may have waiting; more are turned away as busy.
+MAX_WAITING_PER_GUILD = 3
+
+BUSY_MESSAGE = "I'm busy with other servers' requests right now. Please try again in a few seconds."
+
+
+def admission_control_enabled() -> bool:
+    return os.getenv("ADMISSION_CONTROL", "true").lower() in ("1", "true", "yes")
+
+
+class AdmissionDenied(Exception):
+    """
+    A command was not admitted. The message is suitable for showing to users.
+    """
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class TokenBucket:
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.refill_rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def retry_after(self, cost: int) -> float:
+        """
+        :return: How many seconds until `cost` tokens are available, or 0 if they are now.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+        return 0 if self.tokens >= cost else (cost - self.tokens) / self.refill_rate
+
+    def take(self, cost: int):
+        self.tokens -= cost
+
+    def refund(self, cost: int):
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+
+class FairScheduler:
+    """
+    Limits how many commands run at once. When every slot is taken, waiting commands are started in round-robin order
+    across guilds, so a guild with many queued commands can't hold up guilds with few.
+    """
+    def __init__(self, max_running: int = MAX_RUNNING_COMMANDS, max_waiting_per_guild: int = MAX_WAITING_PER_GUILD):
+        self.max_running = max_running
+        self.max_waiting_per_guild = max_waiting_per_guild
+        self.running = 0
+        # Waiting commands by guild, in the order guilds get their next turn.
+        self.waiting: OrderedDict[str, deque[asyncio.Future]] = OrderedDict()
+
+    def waiting_count(self) -> int:
+        return sum(len(queue) for queue in self.waiting.values())
+
+    async def acquire(self, guild_key: str):
+        """
+        Waits for a slot to run in.
+        :raises AdmissionDenied: If the guild already has too many commands waiting.
+        """
+        if self.running < self.max_running and not self.waiting:
+            self.running += 1
+            return
+
+        queue = self.waiting.setdefault(guild_key, deque())
+        if len(queue) >= self.max_waiting_per_guild:
+            raise AdmissionDenied(BUSY_MESSAGE, "busy")
+
+        turn = asyncio.get_running_loop().create_future()
+        queue.append(turn)
+        try:
+            await turn
+        except asyncio.CancelledError:
+            if turn.done() and not turn.cancelled():
+                # The slot was handed over just as this was cancelled, so pass it on.
+                self.release()
+            elif turn in queue:
+                queue.remove(turn)
+                if not queue:
+                    del self.waiting[guild_key]
+            raise
+
+    def release(self):
+        """
+        Hands the finished command's slot to the next guild with a waiting command, or frees it.
+        """
+        while self.waiting:
+            guild_key, queue = self.waiting.popitem(last=False)
+            turn = queue.popleft()
+            if queue:
+                # The guild goes to the back of the line for its next command.
+                self.waiting[guild_key] = queue
+            if not turn.done():
+                turn.set_result(None)
+                return
+        self.running -= 1
+
+
+class AdmissionController:
+    def __init__(self):
+        self.guild_buckets = utils.TtlCache(ttl=BUCKET_IDLE_SECONDS, max_entries=MAX_TRACKED_BUCKETS)
+        self.user_buckets = utils.TtlCache(ttl=BUCKET_IDLE_SECONDS, max_entries=MAX_TRACKED_BUCKETS)
+        self.scheduler = FairScheduler()
+        self.rejected = Counter()
+
+    @staticmethod
+    def bucket(buckets: utils.TtlCache, key, capacity: int, period: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(capacity, period)
+        # Put it back on every use, so active buckets don't expire.
+        buckets.put(key, bucket)
+        return bucket
+
+    def charge(self, guild_key: str, user_id, cost: int) -> [TokenBucket]:
+        """
+        Takes the command's cost from its guild's and user's buckets.
+        :return: The charged buckets.
+        :raises AdmissionDenied: If either bucket doesn't have enough tokens. Neither is charged.
+        """
+        user_bucket = self.bucket(self.user_buckets, user_id, *USER_BUCKET)
+        guild_bucket = self.bucket(self.guild_buckets, guild_key, *GUILD_BUCKET)
+
+        user_retry_after = user_bucket.retry_after(cost)
+        if user_retry_after:
+            raise AdmissionDenied(f"You're sending commands too quickly. Please try again in "
+                                  f"{math.ceil(user_retry_after)} seconds.", "user")
+        guild_retry_after = guild_bucket.retry_after(cost)
+        if guild_retry_after:
+            raise AdmissionDenied(f"This server is sending commands too quickly. Please try again in "
+                                  f"{math.ceil(guild_retry_after)} seconds.", "guild")
+
+        user_bucket.take(cost)
+        guild_bucket.take(cost)
+        return [user_bucket, guild_bucket]
+
+    async def admit(self, guild_key: str, user_id, cost: int):
+        """
+        Charges the command and waits for its turn to run. Callers must call `scheduler.release()` once it finishes.
+        :raises AdmissionDenied: If the command is rate limited or its guild has too many commands waiting.
+        """
+        try:
+            charged_buckets = self.charge(guild_key, user_id, cost)
+            try:
+                await self.scheduler.acquire(guild_key)
+            except AdmissionDenied:
+                # Commands turned away as busy don't count against the rate limits.
+                for bucket in charged_buckets:
+                    bucket.refund(cost)
+                raise
+        except AdmissionDenied as denied:
+            self.rejected[denied.reason] += 1
+            raise
+
+
+CONTROLLER = AdmissionController()
+
+metrics.register_gauge("fcg_admission_running", lambda: CONTROLLER.scheduler.running)
+metrics.register_gauge("fcg_admission_waiting", CONTROLLER.scheduler.waiting_count)
+for rejection_reason in ["user", "guild", "busy"]:
+    metrics.register_gauge(f'fcg_admission_rejected_total{{reason="{rejection_reason}"}}',
+                           lambda reason=rejection_reason: CONTROLLER.rejected[reason])
+
+
+def admitted(cost: int = 1):
+    """
+    Decorates a slash command so it only runs if admitted by the admission controller: rate limited per guild and per
+    user by `cost`, and run in fair turns across guilds when the bot is busy. Rejected commands get an ephemeral reply.
+    Place below `metrics.timed()`, so that time spent waiting for a turn is included in the command's latency.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            ctx = find_context(args)
+            if ctx is None or not admission_control_enabled():
+                return await func(*args, **kwargs)
+
+            # Direct messages are limited per user.
+            guild_key = str(ctx.guild_id) if ctx.guild_id else f"dm-{ctx.author.id}"
+            try:
+                await CONTROLLER.admit(guild_key, ctx.author.id, cost)
+            except AdmissionDenied as denied:
+                logger.info("Command not admitted",
+                            extra=fields(command=func.__name__, guild=ctx.guild_id, reason=denied.reason))
+                await ctx.send(str(denied), ephemeral=True)
+                return
+
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                CONTROLLER.scheduler.release()
+
+        return wrapper
+
+    return decorator
+
+
+def find_context(args: tuple) -> Optional[SlashContext]:
+    # Commands receive their context after `self`.
+    for arg in args:
+        if hasattr(arg, "guild_id") and hasattr(arg, "author"):
+            return arg
+    return None
@@ -0,0 +1,113 @@
+import atexit
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from sharding import shard_count
+
+# Each distinct debug message may be logged at most this many times per window by default.
+DEBUG_RATE_LIMIT = 20
+DEBUG_RATE_WINDOW_SECONDS = 60
+
+_listener: Optional[QueueListener] = None
+
+
+def log_payloads_enabled() -> bool:
+    """
+    Large payload dumps (e.g. full calendar events) are only logged when LOG_PAYLOADS is enabled.
+    """
+    return os.getenv("LOG_PAYLOADS", "false").lower() in ("1", "true", "yes")
+
+
+def fields(**structured_fields) -> dict:
+    """
+    Builds the `extra` argument for a log call with structured fields, e.g.
+    `logger.info("Command completed", extra=fields(command="spell_lookup", latency_ms=42))`.
+    """
+    return {"fields": structured_fields}
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats records as a plain message followed by any structured fields as key=value pairs.
+    """
+    def __init__(self, include_process: bool = False):
+        """
+        :param include_process: Whether to name the process (e.g. shard-1) on each line, when running several shards.
+        """
+        super().__init__("%(levelname)s %(processName)s %(name)s: %(message)s" if include_process
+                         else "%(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        structured_fields = getattr(record, "fields", None)
+        if structured_fields:
+            message += " " + " ".join(f"{key}={value!r}" if isinstance(value, str) and " " in value
+                                      else f"{key}={value}"
+                                      for (key, value) in structured_fields.items())
+        return message
+
+
+class DebugRateLimitFilter(logging.Filter):
+    """
+    Drops debug records once the same message template has been logged too often within a window, so noisy hot-path
+    debug logging can be left enabled.
+    """
+    def __init__(self, limit: int = DEBUG_RATE_LIMIT, window: float = DEBUG_RATE_WINDOW_SECONDS):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.windows: dict[tuple, (float, int)] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        window_start, count = self.windows.get(key, (now, 0))
+        if now - window_start >= self.window:
+            window_start, count = now, 0
+
+        self.windows[key] = (window_start, count + 1)
+        return count < self.limit
+
+
+def configure_logging():
+    """
+    Routes all logging through an unbounded queue drained by a background thread, so that log calls made on the event
+    loop never block on stdout/journald writes. Reads LOG_LEVEL and DEBUG_LOG_RATE_LIMIT from the environment.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+
+    output_handler = logging.StreamHandler(sys.stdout)
+    output_handler.setFormatter(StructuredFormatter(include_process=shard_count() > 1))
+
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(DebugRateLimitFilter(int(os.getenv("DEBUG_LOG_RATE_LIMIT", DEBUG_RATE_LIMIT))))
+
+    root_logger = logging.getLogger()
+    root_logger.handlers = [queue_handler]
+    root_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    _listener = QueueListener(log_queue, output_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    Flushes any queued records and stops the background logging thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
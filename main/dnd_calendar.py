@@ -1,8 +1,10 @@
+import logging
 import os.path
 import string
 from datetime import datetime, timedelta
 from typing import Optional
 
+import attrs
 from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
@@ -12,9 +14,16 @@ from googleapiclient.errors import HttpError
 
 from interactions import Extension, Task, TimeTrigger, Embed, BrandColors, Timestamp, TimestampStyles, slash_command, \
     Button, PartialEmoji, ButtonStyle, listen, TYPE_ALL_CHANNEL, Message, SlashContext
-from interactions.api.events import Component
+from interactions.api.events import BaseEvent, Component
 
-from utils import find_matching_bot_message
+import admission
+import metrics
+import sharding
+from bot_logging import fields, log_payloads_enabled
+from shared_cache import SHARED_CACHE
+from utils import find_matching_bot_message, send_ephemeral
+
+logger = logging.getLogger(__name__)
 
 # Google API scope
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
@@ -57,16 +66,28 @@ EMAIL_NAMES = {
 }
 
 
+@attrs.define(eq=False, order=False, hash=False, kw_only=False)
+class DndSessionScheduled(BaseEvent):
+    """
+    Dispatched (as "dnd_session_scheduled") for each guild with a DnD session on the calendar in the next 24 hours, so
+    other extensions can prepare for it.
+    """
+    guild_id: str = attrs.field()
+    start: Timestamp = attrs.field()
+
+
 class CalendarExtension(Extension):
     @slash_command(
         name="remind_me",
         description="Remind me about any upcoming DnD events in this channel and refresh recent reminders.",
     )
+    @metrics.timed()
+    @admission.admitted(cost=3)
     async def remind_me(self, ctx: SlashContext):
-        print("Refreshing DnD reminders for /remind_me slash command.")
+        logger.info("Refreshing DnD reminders for /remind_me slash command.")
         await self.refresh_dnd_reminders()
 
-        await ctx.send("Refreshed DnD reminders.", ephemeral=True)
+        await send_ephemeral(ctx, "Refreshed DnD reminders.")
 
     @listen()
     async def on_component(self, event: Component):
@@ -74,21 +95,27 @@ class CalendarExtension(Extension):
 
         match ctx.custom_id:
             case "refresh_dnd_reminders":
-                print("Refreshing DnD reminders for Refresh button click.")
+                logger.info("Refreshing DnD reminders for Refresh button click.")
                 await self.refresh_dnd_reminders()
 
                 await ctx.send("Refreshed DnD reminders.", ephemeral=True)
 
     @Task.create(TimeTrigger(hour=12, utc=True))
     async def remind_dnd_events(self):
-        print("Refreshing DnD reminders for daily scheduled task.")
+        logger.info("Refreshing DnD reminders for daily scheduled task.")
         await self.refresh_dnd_reminders()
 
+    @metrics.timed()
     async def refresh_dnd_reminders(self):
+        # Each shard only sends reminders for its own guilds, and skips the calendar request if it has none.
+        guild_ids = [guild_id for guild_id in EVENT_GUILD_CHANNEL_CONFIG if sharding.owns_guild(self.bot, guild_id)]
+        if not guild_ids:
+            return
+
         # Get calendar events
         events = GoogleCalendar.get_todays_events()
 
-        for guild_id in EVENT_GUILD_CHANNEL_CONFIG:
+        for guild_id in guild_ids:
             event_channels = EVENT_GUILD_CHANNEL_CONFIG[guild_id]
             for channel_id in event_channels:
                 channel_config = event_channels[channel_id]
@@ -97,17 +124,19 @@ class CalendarExtension(Extension):
 
                 if event:
                     await self.send_event_reminder(guild_id, channel_id, event)
+                    self.bot.dispatch(DndSessionScheduled(guild_id, iso_to_discord_timestamp(event['start'])))
 
     async def send_event_reminder(self, guild_id: str, channel_id: str, event: dict):
         channel_config: dict = EVENT_GUILD_CHANNEL_CONFIG[guild_id][channel_id]
 
-        channel = self.bot.get_channel(channel_id)
-        print('Sending event reminder in channel "{}"'.format(channel.name))
+        # Fetch rather than get, in case the channel has been evicted from a bounded cache.
+        channel = await self.bot.fetch_channel(channel_id)
+        logger.info('Sending event reminder', extra=fields(guild=guild_id, channel=channel.name))
         # Mention a role if specified.
         content = ' '
         if 'mention_role' in channel_config:
-            guild = self.bot.get_guild(guild_id)
-            role = guild.get_role(channel_config['mention_role'])
+            guild = await self.bot.fetch_guild(guild_id)
+            role = await guild.fetch_role(channel_config['mention_role'])
             content = role.mention
         embed = make_reminder_card(event, channel_config)
         components = make_reminder_components()
@@ -118,19 +147,30 @@ class CalendarExtension(Extension):
             if embed != existing_reminder.embeds[0]\
                     or content != existing_reminder.content\
                     or components != existing_reminder.components:
-                print('Editing existing event reminder in channel "{}" with title "{}"'.format(channel.name, embed.title))
+                logger.info('Editing existing event reminder',
+                            extra=fields(guild=guild_id, channel=channel.name, title=embed.title))
                 await existing_reminder.edit(content=content,
                                              embed=embed,
                                              components=components)
+            SHARED_CACHE.put_reminder(channel.id, embed.title, existing_reminder.id)
         else:
             # Send a new reminder message for this event.
-            print('Sending new event reminder in channel "{}" with title "{}"'.format(channel.name, embed.title))
-            await channel.send(content=content,
-                               embed=embed,
-                               components=components)
+            logger.info('Sending new event reminder',
+                        extra=fields(guild=guild_id, channel=channel.name, title=embed.title))
+            reminder = await channel.send(content=content,
+                                          embed=embed,
+                                          components=components)
+            SHARED_CACHE.put_reminder(channel.id, embed.title, reminder.id)
 
     async def find_last_event_reminder(self, channel: "TYPE_ALL_CHANNEL", title: str) -> Optional[Message]:
-        print('Finding last event reminder in channel "{}" with title "{}"'.format(channel.name, title))
+        # Reminders recorded in the shared cache are fetched directly instead of searching the channel history.
+        message_id = await SHARED_CACHE.get_reminder_message_id(channel.id, title)
+        if message_id is not None:
+            reminder = await channel.fetch_message(message_id)
+            if reminder is not None:
+                return reminder
+
+        logger.debug('Finding last event reminder', extra=fields(channel=channel.name, title=title))
         return await find_matching_bot_message(channel, self.bot,
                                                match_condition=lambda msg: message_is_event_reminder(msg)
                                                                            and msg.embeds[0].title == title)
@@ -151,19 +191,20 @@ class GoogleCalendar:
             tomorrow = (datetime.utcnow() + timedelta(days=1)).isoformat() + 'Z'
 
             # Call the Calendar API
-            print('Fetching Google Calendar events for the next 24 hours')
-            events_result = gcal_client.events().list(calendarId='primary', timeMin=now, timeMax=tomorrow,
-                                                      maxResults=20, singleEvents=True,
-                                                      orderBy='startTime').execute()
+            logger.info('Fetching Google Calendar events for the next 24 hours')
+            with metrics.track_upstream("google_calendar"):
+                events_result = gcal_client.events().list(calendarId='primary', timeMin=now, timeMax=tomorrow,
+                                                          maxResults=20, singleEvents=True,
+                                                          orderBy='startTime').execute()
 
             # Debug Logging for calendar events
             # for event in events_result.get('items', []):
             #     start = event['start'].get('dateTime', event['start'].get('date'))
-            #     print(event['summary'], start)
+            #     logger.debug('%s %s', event['summary'], start)
 
             return events_result.get('items', [])
         except HttpError as error:
-            print('An error occurred getting calendar events: %s' % error)
+            logger.error('An error occurred getting calendar events: %s', error)
 
     @staticmethod
     def google_calendar_client():
@@ -180,7 +221,7 @@ class GoogleCalendar:
             try:
                 creds.refresh(Request())
             except RefreshError as error:
-                print('Failed to refresh credentials', error)
+                logger.warning('Failed to refresh credentials: %s', error)
                 creds = None
 
         # If there are no (valid) credentials available, let the user log in.
@@ -195,7 +236,7 @@ class GoogleCalendar:
         try:
             return build('calendar', 'v3', credentials=creds)
         except HttpError as error:
-            print('An error occurred getting google calendar client: %s' % error)
+            logger.error('An error occurred getting google calendar client: %s', error)
 
 
 def find_event_with_prefix(events: [dict], title_prefix: str):
@@ -209,7 +250,8 @@ def find_event_with_prefix(events: [dict], title_prefix: str):
 
 
 def make_reminder_card(calendar_event: dict, channel_data: dict) -> Embed:
-    print(calendar_event)
+    if log_payloads_enabled():
+        logger.debug('Making reminder card for calendar event: %s', calendar_event)
 
     card = Embed(
         title=calendar_event['summary'] if 'summary' in calendar_event else 'D&D Event',
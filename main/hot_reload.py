@@ -0,0 +1,167 @@
+import asyncio
+import inspect
+import logging
+import os
+import signal
+import sys
+import time
+
+from interactions import Extension, OptionType, Permissions, SlashCommandChoice, SlashContext, Task, listen, \
+    slash_command, slash_option
+
+logger = logging.getLogger(__name__)
+
+# Extensions that can be reloaded in place. Their module-level caches are kept with utils.keep_across_reloads. The
+# modules they import (utils, spell_index, shared_cache, ...) are not reloaded, so changes to those need a restart.
+RELOADABLE_EXTENSIONS = ["dnd_calendar", "polls", "wikidot_scraper"]
+
+# How often extension files are checked for changes when HOT_RELOAD_WATCH is enabled.
+WATCH_INTERVAL_SECONDS = 2
+
+
+class ReloadFailed(Exception):
+    """
+    An extension could not be reloaded, and its previous version is still running. The message is suitable for showing
+    to users.
+    """
+
+
+def reload_all_extensions(bot):
+    """
+    Reloads every reloadable extension, e.g. on SIGHUP (`systemctl reload FreshCutGrass.service`), which deploys send
+    when they only change these extensions. Failures are logged, and the failed extension keeps its previous version.
+    """
+    logger.info("Reloading extensions on signal")
+    for module_name in RELOADABLE_EXTENSIONS:
+        try:
+            reload_extension(bot, module_name)
+        except ReloadFailed as error:
+            logger.error("Hot reload failed: %s", error)
+
+
+def hot_reload_watch_enabled() -> bool:
+    return os.getenv("HOT_RELOAD_WATCH", "false").lower() in ("1", "true", "yes")
+
+
+def module_file(module_name: str) -> str:
+    return sys.modules[module_name].__file__
+
+
+def reload_extension(bot, module_name: str):
+    """
+    Reloads an extension's module from disk, without reconnecting to the gateway. Scheduled tasks that were running in
+    the old extension are stopped, and started again in the new one.
+    :raises ReloadFailed: If the new code doesn't compile or load.
+    """
+    old_module = sys.modules[module_name]
+    try:
+        with open(old_module.__file__) as source_file:
+            compile(source_file.read(), old_module.__file__, "exec")
+    except (OSError, SyntaxError) as error:
+        raise ReloadFailed(f"{module_name} does not compile: {error}") from error
+
+    running_tasks = stop_extension_tasks(bot, module_name)
+    # Reverts to the old module (and logs why) if the new one fails to load.
+    bot.reload_extension(module_name)
+    start_extension_tasks(bot, module_name, running_tasks)
+
+    if sys.modules.get(module_name) is old_module:
+        raise ReloadFailed(f"{module_name} failed to load, so the previous version was kept. See the logs for details.")
+    logger.info("Reloaded extension %s", module_name)
+
+
+def extension_tasks(bot, module_name: str) -> dict[str, Task]:
+    return {name: task for extension in bot.get_extensions(module_name)
+            for (name, task) in inspect.getmembers(extension, lambda member: isinstance(member, Task))}
+
+
+def stop_extension_tasks(bot, module_name: str) -> [str]:
+    """
+    :return: The names of the tasks that were running.
+    """
+    running_tasks = [name for (name, task) in extension_tasks(bot, module_name).items() if task.running]
+    for name in running_tasks:
+        extension_tasks(bot, module_name)[name].stop()
+    return running_tasks
+
+
+def start_extension_tasks(bot, module_name: str, task_names: [str]):
+    for name, task in extension_tasks(bot, module_name).items():
+        if name in task_names:
+            task.start()
+
+
+async def watch_extension_files(bot):
+    """
+    Reloads reloadable extensions whenever their files change, e.g. when a deploy copies new code in place. A changed
+    file is only reloaded once it has stopped changing for one interval, so partially copied files aren't loaded.
+    """
+    loaded_times = {module_name: os.path.getmtime(module_file(module_name)) for module_name in RELOADABLE_EXTENSIONS}
+    seen_times = dict(loaded_times)
+    logger.info("Watching extension files for changes")
+
+    while True:
+        await asyncio.sleep(WATCH_INTERVAL_SECONDS)
+        for module_name in RELOADABLE_EXTENSIONS:
+            try:
+                modified_time = os.path.getmtime(module_file(module_name))
+            except OSError:
+                continue
+
+            if modified_time != seen_times[module_name]:
+                seen_times[module_name] = modified_time
+                continue
+            if modified_time == loaded_times[module_name]:
+                continue
+
+            loaded_times[module_name] = modified_time
+            try:
+                reload_extension(bot, module_name)
+            except ReloadFailed as error:
+                logger.error("Hot reload failed: %s", error)
+
+
+class HotReloadExtension(Extension):
+    background_tasks: [asyncio.Task] = []
+
+    @listen()
+    async def on_startup(self):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_all_extensions, self.bot)
+        except (NotImplementedError, AttributeError):
+            # Signal handlers aren't supported on Windows event loops.
+            logger.warning("SIGHUP hot reload is not supported on this platform")
+
+        if hot_reload_watch_enabled():
+            HotReloadExtension.background_tasks.append(
+                asyncio.get_running_loop().create_task(watch_extension_files(self.bot)))
+
+    @slash_command(
+        name="reload",
+        description="Reload bot extensions from disk without reconnecting.",
+        default_member_permissions=Permissions.ADMINISTRATOR,
+        dm_permission=False,
+    )
+    @slash_option(
+        name="extension",
+        description="The extension to reload. Defaults to all of them.",
+        required=False,
+        opt_type=OptionType.STRING,
+        choices=[SlashCommandChoice(name=module_name, value=module_name) for module_name in RELOADABLE_EXTENSIONS],
+    )
+    async def reload(self, ctx: SlashContext, extension: str = None):
+        # Only this process's shard is reloaded; use HOT_RELOAD_WATCH to reload every shard when files change.
+        results = []
+        for module_name in [extension] if extension else RELOADABLE_EXTENSIONS:
+            start = time.perf_counter()
+            try:
+                reload_extension(self.bot, module_name)
+                results.append(f"Reloaded {module_name} in {(time.perf_counter() - start) * 1000:.0f}ms.")
+            except ReloadFailed as error:
+                results.append(f"Could not reload {module_name}: {error}")
+
+        await ctx.send("\n".join(results), ephemeral=True)
+
+
+def setup(bot):
+    HotReloadExtension(bot)
@@ -1,11 +1,15 @@
+import logging
 import os
-from datetime import datetime
+from typing import Optional
+
 from dotenv import load_dotenv
-from interactions import Activity, ActivityType, Client, Intents, IntervalTrigger, Member, OptionType, \
-    SlashContext, Status, Task, listen, slash_command, slash_option
-from pytz import timezone
+from interactions import AutoDefer, Client, Member, OptionType, SlashContext, listen, slash_command, slash_option
 
+from bot_logging import configure_logging
 from dnd_calendar import CalendarExtension
+from memory_budget import client_options, register_memory_gauges
+from shared_cache import SHARED_CACHE
+from sharding import ShardSupervisor, set_shard_id, shard_count, shard_id
 
 # GUILD_IDS = [
 #     834548590399586365,  # Bot Testing
@@ -16,26 +20,58 @@ from dnd_calendar import CalendarExtension
 # Loads the .env file that resides on the same level as the script.
 load_dotenv()
 
+# Route all logging through the non-blocking queue pipeline.
+configure_logging()
+logger = logging.getLogger("FreshCutGrass")
+
 # Grab the API token from the .env file. This file is NOT included in the git repository, as it contains credentials.
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 
-# Creates the bot with the specified token.
-bot = Client(token=DISCORD_TOKEN, intents=Intents.DEFAULT)
+# Extension files to load (uses import syntax).
+EXTENSIONS = ["dnd_calendar", "polls", "wikidot_scraper", "metrics", "profiler", "presence", "hot_reload"]
+
+# The bot for this process's shard. Set SHARD_COUNT to run several gateway shards, each in its own worker process.
+bot: Optional[Client] = None
+
+
+def create_bot(shard: int = 0, total_shards: int = 1) -> Client:
+    set_shard_id(shard)
+    # Creates the bot with the specified token. Set MEMORY_BUDGET=true to run with narrowed intents and bounded caches.
+    # Any command that hasn't responded after 2 seconds is deferred automatically, ahead of Discord's 3 second deadline.
+    client = Client(token=DISCORD_TOKEN,
+                    auto_defer=AutoDefer(enabled=True, time_until_defer=2.0),
+                    shard_id=shard,
+                    total_shards=total_shards,
+                    # Only the first shard needs to register slash commands with Discord, including after hot reloads.
+                    sync_interactions=shard == 0,
+                    sync_ext=shard == 0,
+                    **client_options())
+    register_memory_gauges(client)
+
+    for extension in EXTENSIONS:
+        client.load_extension(extension)
+    return client
+
+
+def run_shard(shard: int, total_shards: int):
+    global bot
+    bot = create_bot(shard, total_shards)
+    bot.start()
 
 
 @listen()
 async def on_startup():
     # Print debug info about the guilds the bot is active in.
-    print("FreshCutGrass is now active in " + str(len(bot.guilds)) + " guilds:")
+    logger.info("FreshCutGrass shard %s of %s is now active in %s guilds:",
+                shard_id(), bot.total_shards, len(bot.guilds))
     for guild in bot.guilds:
-        print(f"- {guild.name} (id: {guild.id})")
+        logger.info("- %s (id: %s)", guild.name, guild.id)
 
-    # Start task schedules.
-    update_status.start()
-    CalendarExtension.remind_dnd_events.start()
+    if shard_id() == 0:
+        SHARED_CACHE.prune()
 
-    # Immediately update the bot's status.
-    await update_status()
+    # Start task schedules. The bot's status is scheduled by the presence extension.
+    CalendarExtension.remind_dnd_events.start()
 
 
 # @listen()
@@ -47,24 +83,6 @@ async def on_startup():
 #         await message.message.add_reaction("🍋")  # Lemon emoji
 
 
-@Task.create(IntervalTrigger(minutes=10))
-async def update_status():
-    activity: Activity
-    # Check if Critical Role is live
-    now = datetime.now(timezone('US/Pacific'))
-    if now.weekday() == 3 and now.hour >= 18:
-        # It's Thursday Niiiiight
-        print("Setting status to streaming twitch.tv/criticalrole")
-        activity = Activity.create(name="Critical Role",
-                                   type=ActivityType.STREAMING,
-                                   url="https://www.twitch.tv/criticalrole")
-    else:
-        print("Setting status to playing Dungeons & Dragons")
-        activity = Activity.create(name="Dungeons and Dragons",
-                                   type=ActivityType.GAME)
-    await bot.change_presence(status=Status.ONLINE, activity=activity)
-
-
 @slash_command(
     name="hello",
     description="Say hello",
@@ -85,10 +103,9 @@ async def hello(ctx: SlashContext, member: Member = None):
     await ctx.send("Smiley day to you, " + user.mention + "!")
 
 
-# Load extension files (uses import syntax)
-bot.load_extension("dnd_calendar")
-bot.load_extension("polls")
-bot.load_extension("wikidot_scraper")
-
-# Run the bot.
-bot.start()
+# Run the bot. Shard worker processes import this module under another name, and are started by run_shard instead.
+if __name__ == "__main__":
+    if shard_count() > 1:
+        ShardSupervisor(run_shard, shard_count()).run()
+    else:
+        run_shard(0, 1)
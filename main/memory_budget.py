@@ -0,0 +1,76 @@
+import os
+import sys
+
+from interactions import Intents
+from interactions.client.smart_cache import create_cache
+
+import metrics
+
+# The gateway events the extensions actually rely on. Slash commands, buttons and message history all arrive through
+# interactions or REST calls, so only guild (and channel/role) state is needed from the gateway.
+BUDGET_INTENTS = Intents.GUILDS
+
+# Per-cache (ttl seconds, hard limit) used in memory budget mode. Channels, guilds and roles are kept long enough to
+# cover the daily reminder run; anything evicted is fetched again on demand.
+BUDGET_CACHE_LIMITS = {
+    "message_cache": (60, 100),
+    "member_cache": (300, 500),
+    "user_cache": (300, 500),
+    "channel_cache": (3600, 500),
+    "guild_cache": (None, 100),
+    "role_cache": (3600, 500),
+    "dm_channels": (300, 50),
+    "user_guilds": (300, 200),
+}
+
+DISCORD_CACHES = ["message_cache", "member_cache", "user_cache", "channel_cache", "guild_cache", "role_cache",
+                  "dm_channels", "user_guilds"]
+
+
+def memory_budget_enabled() -> bool:
+    return os.getenv("MEMORY_BUDGET", "false").lower() in ("1", "true", "yes")
+
+
+def client_options() -> dict:
+    """
+    :return: Client keyword arguments for the configured memory mode. In memory budget mode, gateway intents are
+    narrowed and every Discord object cache gets an explicit size limit and TTL, so memory stays flat as guilds and
+    traffic grow.
+    Limits can be scaled with MEMORY_BUDGET_SCALE.
+    """
+    if not memory_budget_enabled():
+        return {"intents": Intents.DEFAULT}
+
+    scale = float(os.getenv("MEMORY_BUDGET_SCALE", "1"))
+    options = {
+        "intents": BUDGET_INTENTS,
+        "fetch_members": False,
+    }
+    for cache_name, (ttl, hard_limit) in BUDGET_CACHE_LIMITS.items():
+        options[cache_name] = create_cache(ttl=ttl, hard_limit=max(1, int(hard_limit * scale)))
+    return options
+
+
+def resident_memory_bytes() -> int:
+    """
+    :return: The current resident set size, or the peak RSS on platforms without /proc.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        try:
+            import resource
+        except ImportError:
+            # Neither /proc nor the resource module exist on Windows.
+            return 0
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere.
+        return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def register_memory_gauges(bot):
+    metrics.register_gauge("fcg_resident_memory_bytes", resident_memory_bytes)
+    for cache_name in DISCORD_CACHES:
+        metrics.register_gauge(f'fcg_discord_cache_entries{{cache="{cache_name}"}}',
+                               lambda name=cache_name: len(getattr(bot.cache, name)))
@@ -0,0 +1,343 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from interactions import BrandColors, Embed, Extension, Permissions, SlashContext, listen, slash_command
+
+import sharding
+from bot_logging import fields
+
+logger = logging.getLogger(__name__)
+
+# Local metrics endpoint. Bound to localhost only; set METRICS_PORT=0 to disable it. Each shard process serves its own
+# metrics, on METRICS_PORT plus its shard ID.
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# How often the event loop lag monitor wakes up, in seconds.
+LOOP_LAG_INTERVAL = 0.5
+
+# Histogram bucket upper bounds, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+class Histogram:
+    """
+    A fixed-bucket latency histogram. Quantiles are estimated from the bucket upper bounds.
+    """
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for index, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.bucket_counts[index] += 1
+                break
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running_count = 0
+        for upper_bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            running_count += bucket_count
+            if running_count >= target:
+                return min(upper_bound, self.max)
+        return self.max
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.started_at = time.time()
+
+        self.command_latency: dict[str, Histogram] = {}
+        self.command_errors: Counter = Counter()
+
+        self.upstream_latency: dict[str, Histogram] = {}
+        self.upstream_errors: Counter = Counter()
+
+        self.cache_hits: Counter = Counter()
+        self.cache_misses: Counter = Counter()
+
+        self.loop_lag = Histogram()
+        self.last_loop_lag = 0.0
+
+        # Gauges are sampled lazily when metrics are rendered.
+        self.gauges: dict[str, Callable[[], float]] = {}
+
+    def observe_command(self, command: str, duration: float, failed: bool = False):
+        self.command_latency.setdefault(command, Histogram()).observe(duration)
+        if failed:
+            self.command_errors[command] += 1
+
+    def observe_upstream(self, upstream: str, duration: float, failed: bool = False):
+        self.upstream_latency.setdefault(upstream, Histogram()).observe(duration)
+        if failed:
+            self.upstream_errors[upstream] += 1
+
+    def record_cache(self, cache: str, hit: bool):
+        if hit:
+            self.cache_hits[cache] += 1
+        else:
+            self.cache_misses[cache] += 1
+
+    def upstream_error_rate(self, upstream: str) -> float:
+        calls = self.upstream_latency[upstream].count if upstream in self.upstream_latency else 0
+        return self.upstream_errors[upstream] / calls if calls else 0.0
+
+    def cache_hit_ratio(self, cache: str) -> float:
+        lookups = self.cache_hits[cache] + self.cache_misses[cache]
+        return self.cache_hits[cache] / lookups if lookups else 0.0
+
+    def render_text(self) -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format.
+        """
+        lines = [f"fcg_uptime_seconds {time.time() - self.started_at:.0f}"]
+
+        for name, histogram in sorted(self.command_latency.items()):
+            lines += render_histogram("fcg_command_latency_seconds", f'command="{name}"', histogram)
+        for name, count in sorted(self.command_errors.items()):
+            lines.append(f'fcg_command_errors_total{{command="{name}"}} {count}')
+
+        for name, histogram in sorted(self.upstream_latency.items()):
+            lines += render_histogram("fcg_upstream_latency_seconds", f'upstream="{name}"', histogram)
+        for name, count in sorted(self.upstream_errors.items()):
+            lines.append(f'fcg_upstream_errors_total{{upstream="{name}"}} {count}')
+
+        for name in sorted(set(self.cache_hits) | set(self.cache_misses)):
+            lines.append(f'fcg_cache_hits_total{{cache="{name}"}} {self.cache_hits[name]}')
+            lines.append(f'fcg_cache_misses_total{{cache="{name}"}} {self.cache_misses[name]}')
+
+        lines += render_histogram("fcg_event_loop_lag_seconds", None, self.loop_lag)
+
+        for name, gauge in sorted(self.gauges.items()):
+            try:
+                lines.append(f"{name} {gauge()}")
+            except Exception as error:
+                logger.warning("Failed to sample gauge %s: %s", name, error)
+
+        return "\n".join(lines) + "\n"
+
+
+def render_histogram(metric: str, labels: Optional[str], histogram: Histogram) -> [str]:
+    label_prefix = labels + "," if labels else ""
+    lines = []
+    running_count = 0
+    for upper_bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+        running_count += bucket_count
+        bound = "+Inf" if upper_bound == float('inf') else str(upper_bound)
+        lines.append(f'{metric}_bucket{{{label_prefix}le="{bound}"}} {running_count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{metric}_sum{suffix} {histogram.sum:.6f}")
+    lines.append(f"{metric}_count{suffix} {histogram.count}")
+    return lines
+
+
+# The process-wide metrics registry.
+REGISTRY = MetricsRegistry()
+
+
+def timed(name: Optional[str] = None):
+    """
+    Decorates a coroutine to record its latency and failures as a command metric. Defaults to the function name, which
+    matches the slash command name for extension commands.
+    """
+    def decorator(func):
+        command_name = name or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            failed = False
+            try:
+                return await func(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                latency = time.perf_counter() - start
+                REGISTRY.observe_command(command_name, latency, failed)
+                logger.info("Command %s", "failed" if failed else "completed",
+                            extra=fields(command=command_name, guild=find_guild_id(args), failed=failed,
+                                         latency_ms=round(latency * 1000)))
+
+        return wrapper
+
+    return decorator
+
+
+def find_guild_id(args: tuple) -> Optional[int]:
+    # Commands receive their context after `self`; other timed coroutines have no guild.
+    for arg in args:
+        if hasattr(arg, "guild_id"):
+            return arg.guild_id
+    return None
+
+
+@contextmanager
+def track_upstream(upstream: str):
+    """
+    Records the latency of an outbound call, counting it as an error if the wrapped block raises.
+    """
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        REGISTRY.observe_upstream(upstream, time.perf_counter() - start, failed)
+
+
+def record_cache(cache: str, hit: bool):
+    REGISTRY.record_cache(cache, hit)
+
+
+def register_gauge(name: str, gauge: Callable[[], float]):
+    REGISTRY.gauges[name] = gauge
+
+
+def instrument_discord_http(bot):
+    """
+    Wraps the bot's HTTP client so that every Discord REST call is counted as an upstream call.
+    """
+    http = bot.http
+    if getattr(http.request, "__instrumented__", False):
+        return
+    original_request = http.request
+
+    @functools.wraps(original_request)
+    async def request(*args, **kwargs):
+        with track_upstream("discord"):
+            return await original_request(*args, **kwargs)
+
+    request.__instrumented__ = True
+    http.request = request
+
+
+async def monitor_event_loop_lag():
+    """
+    Measures how late the event loop wakes a sleeping coroutine, which approximates how long callbacks block the loop.
+    """
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(0.0, time.perf_counter() - start - LOOP_LAG_INTERVAL)
+        REGISTRY.last_loop_lag = lag
+        REGISTRY.loop_lag.observe(lag)
+
+
+async def handle_metrics_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        # Read (and ignore) the request line and headers; every path serves the metrics.
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+        body = REGISTRY.render_text().encode('utf-8')
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/plain; version=0.0.4\r\n"
+                     b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                     b"Connection: close\r\n\r\n" + body)
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(port_offset: int = 0) -> Optional[asyncio.AbstractServer]:
+    if not METRICS_PORT:
+        return None
+
+    port = METRICS_PORT + port_offset
+    server = await asyncio.start_server(handle_metrics_request, METRICS_HOST, port)
+    logger.info("Serving metrics on http://%s:%s/metrics", METRICS_HOST, port)
+    return server
+
+
+class MetricsExtension(Extension):
+    background_tasks: [asyncio.Task] = []
+
+    @listen()
+    async def on_startup(self):
+        loop = asyncio.get_running_loop()
+        MetricsExtension.background_tasks.append(loop.create_task(monitor_event_loop_lag()))
+        try:
+            await start_metrics_server(port_offset=sharding.shard_id())
+        except OSError as error:
+            logger.warning("Could not start metrics server: %s", error)
+
+    @slash_command(
+        name="stats",
+        description="Show bot performance statistics.",
+        default_member_permissions=Permissions.ADMINISTRATOR,
+        dm_permission=False,
+    )
+    async def stats(self, ctx: SlashContext):
+        await ctx.send(embeds=make_stats_card(REGISTRY), ephemeral=True)
+
+
+def setup(bot):
+    instrument_discord_http(bot)
+    MetricsExtension(bot)
+
+
+def make_stats_card(registry: MetricsRegistry) -> Embed:
+    card = Embed(
+        title="FreshCutGrass Stats",
+        description=f"Uptime: {format_duration(time.time() - registry.started_at)}",
+        color=BrandColors.YELLOW,
+    )
+
+    command_lines = [f"`{name}` n={histogram.count} p50={histogram.quantile(0.5) * 1000:.0f}ms "
+                     f"p95={histogram.quantile(0.95) * 1000:.0f}ms errors={registry.command_errors[name]}"
+                     for (name, histogram) in sorted(registry.command_latency.items())]
+    card.add_field(name="Commands", value=("\n".join(command_lines) or "-")[:1024], inline=False)
+
+    upstream_lines = [f"`{name}` calls={histogram.count} p95={histogram.quantile(0.95) * 1000:.0f}ms "
+                      f"error rate={registry.upstream_error_rate(name):.1%}"
+                      for (name, histogram) in sorted(registry.upstream_latency.items())]
+    card.add_field(name="Upstreams", value=("\n".join(upstream_lines) or "-")[:1024], inline=False)
+
+    cache_lines = [f"`{name}` hit ratio={registry.cache_hit_ratio(name):.1%} "
+                   f"({registry.cache_hits[name]}/{registry.cache_hits[name] + registry.cache_misses[name]})"
+                   for name in sorted(set(registry.cache_hits) | set(registry.cache_misses))]
+    card.add_field(name="Caches", value=("\n".join(cache_lines) or "-")[:1024], inline=False)
+
+    gauge_lines = []
+    for name, gauge in sorted(registry.gauges.items()):
+        try:
+            gauge_lines.append(f"`{name}` {gauge():,}")
+        except Exception as error:
+            logger.warning("Failed to sample gauge %s: %s", name, error)
+    card.add_field(name="Gauges", value=("\n".join(gauge_lines) or "-")[:1024], inline=False)
+
+    card.add_field(name="Event Loop Lag",
+                   value=f"last={registry.last_loop_lag * 1000:.1f}ms "
+                         f"p99={registry.loop_lag.quantile(0.99) * 1000:.1f}ms "
+                         f"max={registry.loop_lag.max * 1000:.1f}ms",
+                   inline=False)
+
+    return card
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h {minutes}m {seconds}s"
@@ -7,6 +7,11 @@ from dateutil.parser import parser
 from interactions import AutoArchiveDuration, Extension, Message, OptionType, Role, SlashCommandChoice, SlashContext, \
     slash_command, slash_option
 
+import admission
+import metrics
+from shared_cache import SHARED_CACHE
+from utils import send_ephemeral
+
 YES = "🍏"
 MAYBE = "🤨"
 UNLIKELY = "🥶"
@@ -21,6 +26,17 @@ SECOND = "🥈"
 THIRD = "🥉"
 MEDALS = [FIRST, SECOND, THIRD]
 
+# Every option is a message with four reactions, so polls are capped to keep one from using up the rate limits.
+MAX_POLL_OPTIONS = 20
+# Scheduling polls have up to two options per day, so this keeps them within MAX_POLL_OPTIONS.
+MAX_SCHEDULING_DAYS = 10
+
+
+class PollError(Exception):
+    """
+    A poll could not be created. The message is suitable for showing to users.
+    """
+
 
 class ResultRankingMode(Enum):
     SCORE = {YES: 3, MAYBE: 1, UNLIKELY: -1, NO: -3}
@@ -51,8 +67,13 @@ class PollsExtension(Extension):
         required=False,
         opt_type=OptionType.ROLE,
     )
+    @metrics.timed()
+    @admission.admitted(cost=5)
     async def multipoll(self, ctx: SlashContext, question: str, options: str, mention_role: Role = None):
-        await multipoll(ctx, question, options, mention_role)
+        try:
+            await multipoll(ctx, question, options, mention_role)
+        except PollError as error:
+            await send_ephemeral(ctx, f"Error: {error}")
 
     @slash_command(
         name="schedule",
@@ -82,9 +103,14 @@ class PollsExtension(Extension):
         required=False,
         opt_type=OptionType.ROLE,
     )
+    @metrics.timed()
+    @admission.admitted(cost=5)
     async def schedule(self, ctx: SlashContext, question: str, start_date: str = None, end_date: str = None,
                        mention_role: Role = None):
-        await scheduling_multipoll(ctx, question, start_date, end_date, mention_role)
+        try:
+            await scheduling_multipoll(ctx, question, start_date, end_date, mention_role)
+        except PollError as error:
+            await send_ephemeral(ctx, f"Error: {error}")
 
     @slash_command(
         name="multipoll_results",
@@ -98,6 +124,8 @@ class PollsExtension(Extension):
         choices=list(map(lambda ranking_mode_name: SlashCommandChoice(name=ranking_mode_name, value=ranking_mode_name),
                          ResultRankingMode.__members__.keys())),
     )
+    @metrics.timed()
+    @admission.admitted(cost=3)
     async def multipoll_results(self, ctx: SlashContext, ranking_mode: str = ResultRankingMode.SCORE.name):
         await multipoll_results(ctx, ranking_mode)
 
@@ -106,7 +134,14 @@ def setup(bot):
     PollsExtension(bot)
 
 async def multipoll(ctx: SlashContext, question: str, options: str, mention_role: Role = None):
-    poll_options = shlex.split(options)
+    try:
+        poll_options = shlex.split(options)
+    except ValueError as error:
+        raise PollError(f"Could not read the poll options: {error}") from error
+    if not poll_options:
+        raise PollError("Polls need at least one option.")
+    if len(poll_options) > MAX_POLL_OPTIONS:
+        raise PollError(f"Polls can have at most {MAX_POLL_OPTIONS} options.")
 
     await post_multipoll(ctx, question, poll_options, mention_role)
 
@@ -134,7 +169,8 @@ async def post_multipoll(ctx: SlashContext, question: str, poll_options: [str],
 
     # Send all further messages in the thread.
     option_messages = [await thread.send(option_message) for option_message in poll_options]
-    await thread.send(MULTIPOLL_HELP_TEXT)
+    help_message = await thread.send(MULTIPOLL_HELP_TEXT)
+    SHARED_CACHE.register_poll(thread.id, ctx.guild_id, help_message.id, len(option_messages))
 
     # Add emoji reactions to the poll options.
     for emoji in MULTIPOLL_EMOJIS:
@@ -143,21 +179,36 @@ async def post_multipoll(ctx: SlashContext, question: str, poll_options: [str],
 
 
 def get_scheduling_dates(end_date_str: str = None, start_date_str: str = None) -> [date]:
+    """
+    :raises PollError: If a date can't be parsed, or the range is backwards or longer than MAX_SCHEDULING_DAYS.
+    """
     if start_date_str is None:
         start_date = get_next_monday()
     else:
-        start_date = parser().parse(start_date_str).date()
+        start_date = parse_date(start_date_str)
 
     if end_date_str is None:
         # Default poll duration to cover 1 week
         end_date = start_date + timedelta(days=6)
     else:
-        end_date = parser().parse(end_date_str).date()
+        end_date = parse_date(end_date_str)
+
+    if end_date < start_date:
+        raise PollError("The end date must not be before the start date.")
+    if (end_date - start_date).days >= MAX_SCHEDULING_DAYS:
+        raise PollError(f"Scheduling polls can cover at most {MAX_SCHEDULING_DAYS} days.")
 
     num_days = (end_date - start_date).days + 1
     return [start_date + timedelta(days=i) for i in range(num_days)]
 
 
+def parse_date(date_str: str) -> date:
+    try:
+        return parser().parse(date_str).date()
+    except (ValueError, OverflowError) as error:
+        raise PollError(f"Could not read the date \"{date_str}\".") from error
+
+
 def get_options_for_date(date: date) -> [str]:
     day_name = date.strftime("%A")
     date_string = f"{day_name} {date.month}/{date.day}"
@@ -180,9 +231,9 @@ async def multipoll_results(ctx: SlashContext, ranking_mode: str):
 
     last_multipoll = await find_multipoll(ctx, ranking_mode_enum)
     if not last_multipoll:
-        await ctx.send("Could not find multipoll to rank.", ephemeral=True)
+        await send_ephemeral(ctx, "Could not find multipoll to rank.")
         return
-    await ctx.send("Ranking multipoll results.", ephemeral=True)
+    await send_ephemeral(ctx, "Ranking multipoll results.")
 
     # Clear previous medal reactions if present.
     for poll_option in last_multipoll.poll_options:
@@ -266,6 +317,16 @@ class Multipoll:
 
 async def find_multipoll(ctx: SlashContext, ranking_mode: ResultRankingMode = ResultRankingMode.SCORE) \
         -> Optional[Multipoll]:
+    registered_poll = await SHARED_CACHE.get_poll(ctx.channel.id)
+    # A history limit of 0 means no limit, so polls registered without options are found by scanning instead.
+    if registered_poll is not None and registered_poll[1] > 0:
+        # The options of a registered poll are the messages right before its help text, so only those are fetched.
+        help_message_id, option_count = registered_poll
+        messages = await ctx.channel.history(limit=option_count, before=help_message_id).flatten()
+        poll_options = [message for message in messages if message.author == ctx.client.user
+                        and any(reaction.me for reaction in (message.reactions or []))]
+        return Multipoll(question_message=None, poll_option_messages=poll_options, ranking_mode=ranking_mode)
+
     poll_options = []
     found_multipoll = False
     question = None
@@ -275,20 +336,20 @@ async def find_multipoll(ctx: SlashContext, ranking_mode: ResultRankingMode = Re
 
         if not found_multipoll:
             if message.content == MULTIPOLL_HELP_TEXT:
-                # print("Found multipoll: " + message.content)
+                # logger.debug("Found multipoll: %s", message.content)
                 found_multipoll = True
         else:
             if message.content.startswith(MULTIPOLL_QUESTION_PREFIX):
                 question = message
-                # print("Found multipoll question: " + message.content)
+                # logger.debug("Found multipoll question: %s", message.content)
                 break
             elif any(reaction.me for reaction in (message.reactions or [])):
-                # print("Found multipoll option: " + message.content)
+                # logger.debug("Found multipoll option: %s", message.content)
                 poll_options.append(message)
 
     # Verify the question was found.
     if not found_multipoll:
-        await ctx.send("Could not find recent multipoll.", ephemeral=True)
+        await send_ephemeral(ctx, "Could not find recent multipoll.")
         return None
 
     return Multipoll(question_message=question, poll_option_messages=poll_options, ranking_mode=ranking_mode)
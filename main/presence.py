@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from interactions import Activity, ActivityType, Extension, Status, listen
+from pytz import timezone
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TIMEZONE = timezone('US/Pacific')
+
+# The scheduler never sleeps longer than this, so clock changes are picked up eventually.
+MAX_SLEEP = timedelta(days=1)
+# How long to wait before retrying a failed presence update, e.g. while the gateway is reconnecting.
+RETRY_DELAY_SECONDS = 30
+
+
+class PresenceRule:
+    """
+    Shows an activity during a weekly time window in PRESENCE_TIMEZONE. A window with no end time lasts until midnight.
+    """
+    def __init__(self, weekdays: [int], start: time, end: Optional[time], name: str, activity_type: ActivityType,
+                 url: Optional[str] = None):
+        self.weekdays = weekdays
+        self.start = start
+        self.end = end
+        self.name = name
+        self.activity_type = activity_type
+        self.url = url
+
+    def is_active(self, now: datetime) -> bool:
+        local_now = now.astimezone(PRESENCE_TIMEZONE)
+        return local_now.weekday() in self.weekdays \
+            and self.start <= local_now.time() \
+            and (self.end is None or local_now.time() < self.end)
+
+    def boundaries(self, day: date) -> [datetime]:
+        """
+        :return: The times on the given local day at which this rule becomes active or inactive.
+        """
+        if day.weekday() not in self.weekdays:
+            return []
+        window_start = PRESENCE_TIMEZONE.localize(datetime.combine(day, self.start))
+        if self.end is None:
+            window_end = PRESENCE_TIMEZONE.localize(datetime.combine(day + timedelta(days=1), time()))
+        else:
+            window_end = PRESENCE_TIMEZONE.localize(datetime.combine(day, self.end))
+        return [window_start, window_end]
+
+    def create_activity(self) -> Activity:
+        return Activity.create(name=self.name, type=self.activity_type, url=self.url)
+
+
+# Checked in order; the first active rule wins, otherwise DEFAULT_PRESENCE is shown.
+PRESENCE_RULES = [
+    # It's Thursday Niiiiight
+    PresenceRule(weekdays=[3], start=time(18), end=None,
+                 name="Critical Role", activity_type=ActivityType.STREAMING, url="https://www.twitch.tv/criticalrole"),
+]
+DEFAULT_PRESENCE = PresenceRule(weekdays=list(range(7)), start=time(), end=None,
+                                name="Dungeons and Dragons", activity_type=ActivityType.GAME)
+
+
+def get_active_rule(now: datetime, rules: [PresenceRule] = None) -> PresenceRule:
+    rules = PRESENCE_RULES if rules is None else rules
+    return next((rule for rule in rules if rule.is_active(now)), DEFAULT_PRESENCE)
+
+
+def get_next_transition(now: datetime, rules: [PresenceRule] = None) -> Optional[datetime]:
+    """
+    :return: The next time after now at which the active rule may change, or None if no rule ever changes.
+    """
+    rules = PRESENCE_RULES if rules is None else rules
+    today = now.astimezone(PRESENCE_TIMEZONE).date()
+    boundaries = [boundary
+                  for rule in rules
+                  for day_offset in range(8)
+                  for boundary in rule.boundaries(today + timedelta(days=day_offset))
+                  if boundary > now]
+    return min(boundaries, default=None)
+
+
+class PresenceExtension(Extension):
+    scheduler_task: Optional[asyncio.Task] = None
+
+    @listen()
+    async def on_startup(self):
+        if PresenceExtension.scheduler_task is None or PresenceExtension.scheduler_task.done():
+            PresenceExtension.scheduler_task = asyncio.get_running_loop().create_task(self.run_presence_schedule())
+
+    async def run_presence_schedule(self):
+        """
+        Sets the presence for the active rule, then sleeps until the next rule boundary. Presence updates are only sent
+        when the active rule actually changes. Failures are retried, so the schedule keeps running through gateway
+        reconnects.
+        """
+        current_rule: Optional[PresenceRule] = None
+        while True:
+            try:
+                now = datetime.now(PRESENCE_TIMEZONE)
+                rule = get_active_rule(now)
+                if rule is not current_rule:
+                    logger.info("Setting status to %s %s", rule.activity_type.name.lower(), rule.name)
+                    await self.bot.change_presence(status=Status.ONLINE, activity=rule.create_activity())
+                    current_rule = rule
+
+                next_transition = get_next_transition(now)
+                sleep_until = min(next_transition or now + MAX_SLEEP, now + MAX_SLEEP)
+                sleep_seconds = (sleep_until - datetime.now(PRESENCE_TIMEZONE)).total_seconds() + 1
+            except Exception:
+                logger.exception("Failed to update status; retrying in %ss", RETRY_DELAY_SECONDS)
+                sleep_seconds = RETRY_DELAY_SECONDS
+            await asyncio.sleep(sleep_seconds)
+
+
+def setup(bot):
+    PresenceExtension(bot)
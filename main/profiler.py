@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from interactions import Extension, File, OptionType, Permissions, SlashContext, listen, slash_command, slash_option
+
+logger = logging.getLogger(__name__)
+
+# How often the sampler captures the event loop thread's stack, in seconds.
+SAMPLE_INTERVAL = 0.005
+MAX_PROFILE_SECONDS = 120
+# Profiles triggered by SIGUSR1 (e.g. `systemctl kill -s USR1 FreshCutGrass.service`) run for this long.
+SIGNAL_PROFILE_SECONDS = int(os.getenv("SIGNAL_PROFILE_SECONDS", "30"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+TOP_FUNCTION_COUNT = 15
+
+
+class SamplingProfiler:
+    """
+    A low-overhead sampling profiler. A background thread periodically captures the stacks of every other thread, such
+    as the event loop and the Wikidot threads that parse pages, and counts identical stacks, which can be written out in
+    the collapsed-stack format used by flamegraph tools. Each stack starts with its thread's name.
+    """
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stack_counts: Counter = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample_loop, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _sample_loop(self):
+        sampler_thread_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == sampler_thread_id:
+                    continue
+
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, f"thread-{thread_id}"))
+                stack.reverse()
+
+                self.stack_counts[";".join(stack)] += 1
+            self.sample_count += 1
+
+    def collapsed_stacks(self) -> str:
+        return "\n".join(f"{stack} {count}" for (stack, count) in self.stack_counts.most_common()) + "\n"
+
+    def top_functions(self, limit: int = TOP_FUNCTION_COUNT) -> [(str, int, int)]:
+        """
+        :return: Tuples of (function, self samples, total samples), ordered by total samples. Threads are sampled
+            together, so a function's samples are counted across all threads.
+        """
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stack_counts.items():
+            # The first frame is the thread's name.
+            frames = stack.split(";")[1:]
+            self_counts[frames[-1]] += count
+            # Count each function once per stack, so recursion doesn't inflate the total.
+            for function in set(frames):
+                total_counts[function] += count
+
+        return [(function, self_counts[function], total)
+                for (function, total) in total_counts.most_common(limit)]
+
+
+# Only one profile may run at a time. Callers check it and acquire it without awaiting anything in between, so two
+# requests can't both start a profile.
+profile_lock = asyncio.Lock()
+
+
+async def run_profile(seconds: int) -> (SamplingProfiler, str):
+    """
+    Samples the bot's threads for the given duration and writes the collapsed stacks to PROFILE_DIR. Pages parsed in
+    PARSE_WORKERS processes aren't sampled. Callers must hold profile_lock.
+    :return: The finished profiler and the path of the collapsed-stack file.
+    """
+    profiler = SamplingProfiler()
+    logger.info("Starting sampling profiler for %s seconds", seconds)
+    profiler.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, datetime.now().strftime("profile-%Y%m%d-%H%M%S.collapsed"))
+    with open(path, 'w') as profile_file:
+        profile_file.write(profiler.collapsed_stacks())
+    logger.info("Wrote %s profile samples to %s", profiler.sample_count, path)
+
+    return profiler, path
+
+
+def format_top_functions(profiler: SamplingProfiler) -> str:
+    if not profiler.sample_count:
+        return "No samples were captured."
+
+    lines = [f"{profiler.sample_count} samples. Top functions (self% / total%):"]
+    for function, self_count, total_count in profiler.top_functions():
+        self_share = self_count / profiler.sample_count
+        total_share = total_count / profiler.sample_count
+        lines.append(f"{self_share:6.1%} {total_share:6.1%}  {function}")
+    return "```\n" + "\n".join(lines)[:1900] + "\n```"
+
+
+class ProfilerExtension(Extension):
+    @listen()
+    async def on_startup(self):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, start_signal_profile)
+        except (NotImplementedError, AttributeError):
+            # Signal handlers aren't supported on Windows event loops.
+            logger.warning("SIGUSR1 profiling is not supported on this platform")
+
+    @slash_command(
+        name="profile",
+        description="Profile the bot for a number of seconds and report the hottest functions.",
+        default_member_permissions=Permissions.ADMINISTRATOR,
+        dm_permission=False,
+    )
+    @slash_option(
+        name="seconds",
+        description="How long to profile for.",
+        required=False,
+        opt_type=OptionType.INTEGER,
+        min_value=1,
+        max_value=MAX_PROFILE_SECONDS,
+    )
+    async def profile(self, ctx: SlashContext, seconds: int = 10):
+        if profile_lock.locked():
+            await ctx.send("A profile is already running.", ephemeral=True)
+            return
+
+        # Acquiring an unlocked lock doesn't yield to the loop, so nothing can start a profile after the check above.
+        async with profile_lock:
+            # Profiling outlasts the interaction response deadline, so acknowledge first.
+            await ctx.defer(ephemeral=True)
+            profiler, path = await run_profile(seconds)
+
+        await ctx.send(format_top_functions(profiler), file=File(path), ephemeral=True)
+
+
+def setup(bot):
+    ProfilerExtension(bot)
+
+
+def start_signal_profile():
+    async def profile_and_report():
+        # Checked in the task rather than the signal handler, since a command could start a profile before it runs.
+        if profile_lock.locked():
+            logger.warning("Ignoring profiling signal; a profile is already running")
+            return
+        async with profile_lock:
+            profiler, path = await run_profile(SIGNAL_PROFILE_SECONDS)
+        logger.info("Profile results:\n%s", format_top_functions(profiler))
+
+    asyncio.get_running_loop().create_task(profile_and_report())
@@ -0,0 +1,124 @@
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.connection import wait
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Discord only accepts one gateway identify every 5 seconds (for bots without large bot sharding), so shards are
+# started this far apart.
+SHARD_START_INTERVAL_SECONDS = 5
+# How long to wait before restarting a shard process that exited unexpectedly.
+SHARD_RESTART_DELAY_SECONDS = 10
+# How long shards get to exit after being asked to stop, before they are killed.
+SHARD_STOP_TIMEOUT_SECONDS = 10
+
+# The shard this process runs, set by set_shard_id before its bot is created. Each shard has its own process.
+_shard_id = 0
+
+
+def shard_count() -> int:
+    """
+    :return: The number of gateway shards to run, from SHARD_COUNT. Each shard runs in its own worker process.
+    """
+    return max(1, int(os.getenv("SHARD_COUNT", "1")))
+
+
+def set_shard_id(shard: int):
+    global _shard_id
+    _shard_id = shard
+
+
+def shard_id() -> int:
+    return _shard_id
+
+
+def guild_shard_id(guild_id, total_shards: int) -> int:
+    """
+    :return: The shard that Discord routes the guild's events and interactions to.
+    """
+    return (int(guild_id) >> 22) % total_shards
+
+
+def owns_guild(bot, guild_id) -> bool:
+    """
+    :return: Whether the guild belongs to this bot's shard. Work that isn't triggered by a guild's own events (like
+    scheduled reminders) should only be done by the owning shard, so it isn't repeated by every process.
+    """
+    return guild_shard_id(guild_id, bot.total_shards) == shard_id()
+
+
+class ShardSupervisor:
+    """
+    Runs each shard in its own worker process, restarting any that exit unexpectedly. SIGTERM stops every shard, and
+    SIGHUP and SIGUSR1 are forwarded to all of them (see the hot_reload and profiler extensions).
+    """
+    def __init__(self, run_shard: Callable[[int, int], None], total_shards: int):
+        """
+        :param run_shard: A module-level function taking (shard_id, total_shards) that runs a shard until it stops.
+        :param total_shards: The number of shards to run.
+        """
+        self.run_shard = run_shard
+        self.total_shards = total_shards
+        # Spawn rather than fork, so each shard starts with fresh logging threads and event loop state.
+        self.context = multiprocessing.get_context("spawn")
+        self.processes: dict[int, multiprocessing.Process] = {}
+        self.stopping = False
+
+    def start_shard(self, shard: int):
+        process = self.context.Process(target=self.run_shard, args=(shard, self.total_shards), name=f"shard-{shard}")
+        process.start()
+        self.processes[shard] = process
+        logger.info("Started shard %s of %s (pid %s)", shard, self.total_shards, process.pid)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        for forwarded_signal in ["SIGHUP", "SIGUSR1"]:
+            if hasattr(signal, forwarded_signal):
+                signal.signal(getattr(signal, forwarded_signal), self.forward_signal)
+
+        for shard in range(self.total_shards):
+            if self.stopping:
+                break
+            if shard > 0:
+                time.sleep(SHARD_START_INTERVAL_SECONDS)
+            self.start_shard(shard)
+
+        while not self.stopping:
+            sentinels = {process.sentinel: shard for (shard, process) in self.processes.items()}
+            for sentinel in wait(list(sentinels)):
+                shard = sentinels[sentinel]
+                if self.stopping:
+                    break
+                logger.error("Shard %s exited with code %s; restarting in %ss", shard,
+                             self.processes[shard].exitcode, SHARD_RESTART_DELAY_SECONDS)
+                time.sleep(SHARD_RESTART_DELAY_SECONDS)
+                if not self.stopping:
+                    self.start_shard(shard)
+
+        self.stop_shards()
+
+    def handle_stop(self, signal_number, frame):
+        self.stopping = True
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+
+    def forward_signal(self, signal_number, frame):
+        for process in self.processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal_number)
+
+    def stop_shards(self):
+        deadline = time.monotonic() + SHARD_STOP_TIMEOUT_SECONDS
+        for shard, process in self.processes.items():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning("Shard %s did not stop in time; killing it", shard)
+                process.kill()
+                process.join()
+        logger.info("All shards stopped")
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_FILE = "shared_cache.sqlite3"
+
+# Pages older than this are dropped entirely; until then they can still be served while Wikidot is unavailable.
+MAX_PAGE_AGE_SECONDS = 7 * 24 * 60 * 60
+# Polls, reminders and lookup counts not used for this long are removed.
+MAX_RECORD_AGE_SECONDS = 30 * 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    path TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS item_categories (
+    name TEXT PRIMARY KEY,
+    category TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS polls (
+    thread_id TEXT PRIMARY KEY,
+    guild_id TEXT,
+    help_message_id TEXT NOT NULL,
+    option_count INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lookups (
+    guild_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (guild_id, kind, name)
+);
+CREATE TABLE IF NOT EXISTS reminders (
+    channel_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (channel_id, title)
+);
+"""
+
+
+class SharedCache:
+    """
+    A SQLite database shared by every shard process on this host (and kept across restarts). It holds Wikidot lookup
+    results behind each process's in-memory caches, how often each guild looks things up, the poll registry and the
+    state of sent event reminders.
+    The database runs in WAL mode, so shards can read while another one writes. Statements run on a single worker
+    thread, since waiting for another shard's write lock can take seconds: reads are awaited, and writes are queued
+    without waiting. Statements run in the order they were issued, so reads see earlier writes.
+    """
+    def __init__(self, path: Optional[str] = None):
+        """
+        :param path: The database file. Defaults to SHARED_CACHE_FILE, which can be overridden in the environment.
+        """
+        self.path = path
+        self.connection: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-cache")
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            path = self.path or os.getenv("SHARED_CACHE_FILE", SHARED_CACHE_FILE)
+            self.connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(SCHEMA)
+            logger.info("Opened shared cache %s", path)
+        return self.connection
+
+    def execute(self, sql: str, parameters: tuple = ()) -> list[tuple]:
+        """
+        Runs a statement on the calling thread, returning any rows. Errors are logged rather than raised, since
+        everything stored here can be rebuilt from Discord and Wikidot.
+        """
+        with self.lock:
+            try:
+                return self.connect().execute(sql, parameters).fetchall()
+            except sqlite3.Error as error:
+                logger.warning("Shared cache query failed: %s", error)
+                return []
+
+    async def query(self, sql: str, parameters: tuple = ()) -> list[tuple]:
+        """
+        Runs a statement on the shared cache's thread, and waits for its rows.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.execute, sql, parameters)
+
+    def submit(self, sql: str, parameters: tuple = ()):
+        """
+        Queues a statement to run on the shared cache's thread, without waiting for it.
+        """
+        self.executor.submit(self.execute, sql, parameters)
+
+    async def get_page(self, path: str) -> Optional[tuple[str, float]]:
+        """
+        :return: The page's text and the wall clock time it was fetched at, or None if it isn't cached.
+        """
+        rows = await self.query("SELECT text, fetched_at FROM pages WHERE path = ?", (path,))
+        return rows[0] if rows else None
+
+    def put_page(self, path: str, text: str):
+        self.submit("INSERT OR REPLACE INTO pages (path, text, fetched_at) VALUES (?, ?, ?)",
+                    (path, text, time.time()))
+
+    async def get_item_category(self, name: str) -> Optional[str]:
+        rows = await self.query("SELECT category FROM item_categories WHERE name = ?", (name,))
+        return rows[0][0] if rows else None
+
+    def put_item_category(self, name: str, category: str):
+        self.submit("INSERT OR REPLACE INTO item_categories (name, category) VALUES (?, ?)", (name, category))
+
+    def remove_item_category(self, name: str):
+        self.submit("DELETE FROM item_categories WHERE name = ?", (name,))
+
+    def record_lookup(self, guild_id, kind: str, name: str):
+        self.submit("INSERT INTO lookups (guild_id, kind, name, count, last_used) VALUES (?, ?, ?, 1, ?) "
+                    "ON CONFLICT (guild_id, kind, name) "
+                    "DO UPDATE SET count = count + 1, last_used = excluded.last_used",
+                    (str(guild_id), kind, name, time.time()))
+
+    async def lookup_guild_ids(self) -> [str]:
+        return [row[0] for row in await self.query("SELECT DISTINCT guild_id FROM lookups")]
+
+    async def top_lookups(self, guild_ids: [str], limit: int) -> [tuple[str, str]]:
+        """
+        :return: The (kind, name) of the most frequent lookups across the guilds, most frequent first.
+        """
+        if not guild_ids:
+            return []
+        placeholders = ", ".join("?" * len(guild_ids))
+        return await self.query(f"SELECT kind, name FROM lookups WHERE guild_id IN ({placeholders}) "
+                                f"GROUP BY kind, name ORDER BY SUM(count) DESC LIMIT ?",
+                                (*map(str, guild_ids), limit))
+
+    def register_poll(self, thread_id, guild_id, help_message_id, option_count: int):
+        self.submit("INSERT OR REPLACE INTO polls (thread_id, guild_id, help_message_id, option_count, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (str(thread_id), str(guild_id) if guild_id else None, str(help_message_id), option_count,
+                     time.time()))
+
+    async def get_poll(self, thread_id) -> Optional[tuple[str, int]]:
+        """
+        :return: The poll's help message ID and number of options, or None if no poll was registered for the thread.
+        """
+        rows = await self.query("SELECT help_message_id, option_count FROM polls WHERE thread_id = ?",
+                                (str(thread_id),))
+        return rows[0] if rows else None
+
+    async def get_reminder_message_id(self, channel_id, title: str) -> Optional[str]:
+        rows = await self.query("SELECT message_id FROM reminders WHERE channel_id = ? AND title = ?",
+                                (str(channel_id), title))
+        return rows[0][0] if rows else None
+
+    def put_reminder(self, channel_id, title: str, message_id):
+        self.submit("INSERT OR REPLACE INTO reminders (channel_id, title, message_id, updated_at) VALUES (?, ?, ?, ?)",
+                    (str(channel_id), title, str(message_id), time.time()))
+
+    def clear_lookups(self):
+        self.submit("DELETE FROM pages")
+        self.submit("DELETE FROM item_categories")
+
+    def prune(self, max_page_age: float = MAX_PAGE_AGE_SECONDS, max_record_age: float = MAX_RECORD_AGE_SECONDS):
+        """
+        Queues the removal of pages, polls, reminders and lookup counts that are too old to be useful.
+        """
+        now = time.time()
+        self.submit("DELETE FROM pages WHERE fetched_at < ?", (now - max_page_age,))
+        self.submit("DELETE FROM polls WHERE created_at < ?", (now - max_record_age,))
+        self.submit("DELETE FROM reminders WHERE updated_at < ?", (now - max_record_age,))
+        self.submit("DELETE FROM lookups WHERE last_used < ?", (now - max_record_age,))
+
+
+SHARED_CACHE = SharedCache()
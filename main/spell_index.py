@@ -0,0 +1,174 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from os import linesep
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SPELL_INDEX_FILE = "spell_index.json"
+
+SCHOOLS = ["abjuration", "conjuration", "divination", "enchantment", "evocation", "illusion", "necromancy",
+           "transmutation"]
+COMPONENTS = ["V", "S", "M"]
+
+# Words in a spell's name count this many times more than words in its description.
+NAME_WEIGHT = 5
+STOP_WORDS = {"a", "an", "and", "are", "as", "at", "be", "by", "can", "for", "from", "has", "in", "is", "it", "its",
+              "of", "on", "or", "that", "the", "this", "to", "with", "you", "your"}
+TOKEN_PATTERN = re.compile("[a-z0-9']+")
+
+
+def tokenize(text: str) -> [str]:
+    return [token.strip("'") for token in TOKEN_PATTERN.findall(text.lower())
+            if token not in STOP_WORDS and token.strip("'")]
+
+
+class SpellRecord:
+    """
+    The searchable fields of a parsed spell.
+    """
+    def __init__(self, name: str, classification: str, level: int, school: Optional[str], classes: [str],
+                 components: [str], text: str):
+        self.name = name
+        self.classification = classification
+        self.level = level
+        self.school = school
+        self.classes = classes
+        self.components = components
+        self.text = text
+
+    @staticmethod
+    def from_spell(spell) -> "SpellRecord":
+        """
+        :param spell: A parsed wikidot_scraper.DndSpell.
+        """
+        classification = spell.classification.strip('* ')
+        level_match = re.search(r"(\d)(st|nd|rd|th)-level", classification)
+        school = next((school for school in SCHOOLS if school in classification.lower()), None)
+        classes = [spell_class.strip() for spell_class in spell.spell_lists[19:].split(',') if spell_class.strip()]
+        # Material component details are in brackets after the component letters.
+        components = [component.strip() for component in spell.components[16:].split('(', 1)[0].split(',')
+                      if component.strip() in COMPONENTS]
+
+        return SpellRecord(name=spell.name.strip('_*'),
+                           classification=classification,
+                           level=int(level_match.group(1)) if level_match else 0,
+                           school=school,
+                           classes=classes,
+                           components=components,
+                           text=linesep.join(spell.description_lines + spell.extra_lines))
+
+    def key(self) -> str:
+        return self.name.lower()
+
+    def matches_filters(self, school: Optional[str] = None, level: Optional[int] = None,
+                        spell_class: Optional[str] = None, components: Optional[list[str]] = None) -> bool:
+        return (school is None or self.school == school.lower()) \
+            and (level is None or self.level == level) \
+            and (spell_class is None or spell_class.lower() in (c.lower() for c in self.classes)) \
+            and (components is None or set(self.components) <= set(components))
+
+
+class SpellIndex:
+    """
+    An in-memory inverted index over spell names and descriptions, ranked by TF-IDF.
+    """
+    def __init__(self):
+        self.records: dict[str, SpellRecord] = {}
+        # term -> {spell key -> weighted term frequency}
+        self.postings: dict[str, dict[str, int]] = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, spell_name: str) -> bool:
+        return spell_name.lower() in self.records
+
+    def add(self, record: SpellRecord):
+        key = record.key()
+        if key in self.records:
+            self.remove(key)
+        self.records[key] = record
+
+        term_counts = Counter(tokenize(record.text))
+        for token in tokenize(record.name):
+            term_counts[token] += NAME_WEIGHT
+        for term, count in term_counts.items():
+            self.postings.setdefault(term, {})[key] = count
+
+    def remove(self, key: str):
+        self.records.pop(key, None)
+        for term in list(self.postings):
+            self.postings[term].pop(key, None)
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def search(self, query: str, limit: int = 10, **filters) -> [SpellRecord]:
+        """
+        :param query: Free text to search for. If empty, all spells matching the filters are returned by name.
+        :param limit: The maximum number of results.
+        :param filters: Filters accepted by SpellRecord.matches_filters.
+        :return: The best matching spells, best first.
+        """
+        terms = tokenize(query)
+        if not terms:
+            matches = [record for record in self.records.values() if record.matches_filters(**filters)]
+            return sorted(matches, key=lambda record: record.name)[:limit]
+
+        scores = Counter()
+        for term in set(terms):
+            for matching_term in self.expand_term(term):
+                term_postings = self.postings[matching_term]
+                inverse_document_frequency = math.log(1 + len(self.records) / len(term_postings))
+                for key, count in term_postings.items():
+                    scores[key] += (1 + math.log(count)) * inverse_document_frequency
+
+        results = []
+        for key, _ in scores.most_common():
+            record = self.records[key]
+            if record.matches_filters(**filters):
+                results.append(record)
+                if len(results) == limit:
+                    break
+        return results
+
+    def expand_term(self, term: str) -> [str]:
+        """
+        :return: The term itself if it is indexed, otherwise any indexed terms it is a prefix of (e.g. "fire" matches
+        "fireball").
+        """
+        if term in self.postings:
+            return [term]
+        if len(term) < 3:
+            return []
+        return [indexed_term for indexed_term in self.postings if indexed_term.startswith(term)]
+
+    def save(self, path: str = SPELL_INDEX_FILE):
+        save_records(list(self.records.values()), path)
+
+    def load(self, path: str = SPELL_INDEX_FILE):
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path) as index_file:
+                for record_fields in json.load(index_file):
+                    self.add(SpellRecord(**record_fields))
+            logger.info("Loaded %s spells into the spell search index", len(self.records))
+        except (OSError, ValueError, TypeError) as error:
+            logger.warning("Could not load spell index from %s: %s", path, error)
+
+
+def save_records(records: [SpellRecord], path: str = SPELL_INDEX_FILE):
+    """
+    Writes spell records to an index file, which SpellIndex.load reads. Doesn't touch any SpellIndex, so it can run on
+    another thread while the index is in use.
+    """
+    # Write to a temporary file first, so other shard processes never load a partially written index.
+    temporary_path = path + ".tmp"
+    with open(temporary_path, 'w') as index_file:
+        json.dump([vars(record) for record in records], index_file)
+    os.replace(temporary_path, path)
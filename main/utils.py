@@ -1,7 +1,13 @@
+import asyncio
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from os import linesep
-from typing import Iterator, Optional, Callable, Union
+from typing import Any, Iterator, Optional, Callable, Union
 
-from interactions import TYPE_ALL_CHANNEL, Message, Client, Member, User
+from interactions import TYPE_ALL_CHANNEL, Message, Client, Member, User, InteractionContext
 
 
 def smart_split(string: str, length_limit: int) -> Iterator[str]:
@@ -45,3 +51,170 @@ async def find_matching_message(channel: "TYPE_ALL_CHANNEL", message_limit: int
         if match_condition(message):
             return message
     return None
+
+
+async def send_ephemeral(ctx: InteractionContext, content: str):
+    """
+    Replies with a message only the command's user can see. A public deferred response (e.g. from auto-defer while the
+    command waited for admission) can't be made ephemeral, so it's deleted and the reply is sent as a follow-up instead.
+    :param ctx: The command's context.
+    :param content: The message to send.
+    """
+    if ctx.deferred and not ctx.ephemeral and not ctx.responded:
+        await ctx.client.http.delete_interaction_message(ctx.client.app.id, ctx.token)
+        # Later messages are follow-ups to the deleted response.
+        ctx.responded = True
+    await ctx.send(content, ephemeral=True)
+
+
+# Module-level objects kept across extension hot reloads, by (module name, object name). This module is never reloaded.
+_kept_objects: dict[tuple[str, str], Any] = {}
+
+
+def keep_across_reloads(module_name: str, name: str, factory: Callable[[], Any]) -> Any:
+    """
+    Creates a module-level object the first time its module is loaded, and returns that same object whenever the module
+    is reloaded (see the hot_reload extension), so caches and other state survive code updates.
+    :param module_name: The owning module's __name__.
+    :param name: The object's name within the module.
+    :param factory: Creates the object on the module's first load.
+    :return: The kept object.
+    """
+    key = (module_name, name)
+    if key not in _kept_objects:
+        _kept_objects[key] = factory()
+    return _kept_objects[key]
+
+
+class TtlCache:
+    """
+    A small in-memory cache whose entries expire after a fixed time to live. When full, the least recently used entry
+    is evicted. Expired entries are kept until evicted, so callers can still fall back to stale values.
+    """
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: OrderedDict[Any, (float, Any)] = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key, allow_stale: bool = False) -> Optional[Any]:
+        """
+        :param key: The cache key.
+        :param allow_stale: Whether to return the value even if it has expired.
+        :return: The cached value, or None if there is no (fresh) value.
+        """
+        if key not in self.entries:
+            return None
+
+        expires_at, value = self.entries[key]
+        if not allow_stale and time.monotonic() >= expires_at:
+            return None
+
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value, ttl: Optional[float] = None):
+        """
+        :param ttl: Overrides the cache's time to live for this entry, e.g. for values cached elsewhere first.
+        """
+        self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def pop(self, key):
+        self.entries.pop(key, None)
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing upstream. After `failure_threshold` consecutive failures the circuit opens and requests are
+    rejected until a backoff period has passed; then a single trial request is allowed through. Each failed trial
+    doubles the backoff, up to `max_backoff`, and any success closes the circuit again. Failures of requests that were
+    already in flight when the circuit opened don't count as failed trials.
+    """
+    def __init__(self, failure_threshold: int = 3, base_backoff: float = 10, max_backoff: float = 300):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.consecutive_failures = 0
+        self.backoff = base_backoff
+        self.open_until: Optional[float] = None
+        self.trial_in_flight = False
+
+    def is_open(self) -> bool:
+        return self.open_until is not None and time.monotonic() < self.open_until
+
+    def allow_request(self) -> bool:
+        if self.open_until is None:
+            return True
+        if self.is_open():
+            return False
+
+        # Half open: let this request through as a trial, and hold off any others until it finishes.
+        self.open_until = time.monotonic() + self.backoff
+        self.trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.backoff = self.base_backoff
+        self.open_until = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.trial_in_flight:
+            # A trial request failed, so back off for longer.
+            self.trial_in_flight = False
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+            self.open_until = time.monotonic() + self.backoff
+        elif self.open_until is None and self.consecutive_failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.backoff
+
+
+class ProcessOffloadPool:
+    """
+    Runs CPU-bound functions in worker processes, so they don't hold the GIL while the event loop is trying to run.
+    Functions must be module-level functions of modules other than __main__, and their arguments and results must be
+    picklable. Workers are started on first use.
+    """
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+        # Jobs submitted but not yet finished, including those running.
+        self.queue_depth = 0
+
+    async def start(self):
+        """
+        Starts every worker now, rather than on first use. Workers take a while to start, since they import the main
+        module.
+        """
+        await asyncio.gather(*[self.run(time.monotonic) for _ in range(self.workers)])
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        :raises BrokenProcessPool: If a worker died. A new pool is started for later jobs.
+        """
+        if self.executor is None:
+            # Spawn rather than fork, so workers don't inherit the bot's threads and sockets.
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context("spawn"))
+
+        executor = self.executor
+        self.queue_depth += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            if self.executor is executor:
+                self.executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            self.queue_depth -= 1
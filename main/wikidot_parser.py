@@ -0,0 +1,128 @@
+import logging
+from html.parser import HTMLParser
+from os import linesep
+
+logger = logging.getLogger(__name__)
+
+DIVS_TO_PARSE = ['page-title page-header', 'page-content']
+
+
+def parse_wikidot_html(html_content: bytes) -> str:
+    logger.debug("Parsing Wikidot HTML content")
+    parser = WikidotHtmlParser()
+    parser.feed(html_content.decode('utf-8'))
+    parser.close()
+
+    return parser.output
+
+
+def parse_wikidot_links(html_content: bytes, path_prefix: str) -> [str]:
+    """
+    :return: The (de-duplicated) paths of all links on the page starting with the prefix.
+    """
+    parser = WikidotLinkParser(path_prefix)
+    parser.feed(html_content.decode('utf-8'))
+    parser.close()
+
+    return parser.paths
+
+
+class WikidotHtmlParser(HTMLParser):
+    def __init__(self):
+        HTMLParser.__init__(self)
+
+        # Initialize parsing fields
+        self.output = ""
+        self.current_parsing_div_level = -1
+        self.div_level = 0
+
+    def is_parsing_content_div(self):
+        return self.current_parsing_div_level != -1
+
+    def feed(self, data):
+        # Reset parsing fields
+        self.output = ""
+        self.current_parsing_div_level = -1
+        self.div_level = 0
+
+        super(WikidotHtmlParser, self).feed(data)
+
+    def handle_data(self, data: str):
+        # Only parse data within the main-content div.
+        if self.is_parsing_content_div():  # and 'nitroAds' not in data:
+            self.output += data.strip()
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'div':
+            for (attribute_key, attribute_value) in attrs:
+                if attribute_key == 'class' or attribute_key == 'id':
+                    if attribute_value in DIVS_TO_PARSE and not self.is_parsing_content_div():
+                        self.current_parsing_div_level = self.div_level
+
+            self.div_level += 1
+
+        if self.is_parsing_content_div():
+            if tag == 'strong':
+                self.output += '**'
+            if tag == 'em':
+                self.output += '*'
+            if tag == 'br':
+                self.output += linesep
+            if tag == 'p':
+                self.output += linesep
+            if tag == 'span':
+                self.output += '__**'
+            if tag == 'th':
+                self.output += '__ '
+            if tag == 'li':
+                self.output += '• '
+            if tag == 'a':
+                self.output += ' '
+            return
+
+    def handle_endtag(self, tag):
+        if tag == 'div':
+            self.div_level -= 1
+
+            # Check if this closes any tracked divs.
+            if self.div_level == self.current_parsing_div_level:
+                self.current_parsing_div_level = -1
+        elif self.is_parsing_content_div():
+            if tag == 'strong':
+                self.output += '** '
+            if tag == 'em':
+                self.output += '* '
+            if tag == 'p':
+                self.output += linesep
+            if tag == 'span':
+                self.output += '**__'
+            if tag == 'tr':
+                self.output += linesep
+            if tag == 'th':
+                self.output += '__\t\t\t'
+            if tag == 'td':
+                self.output += '\t\t\t'
+            if tag == 'li':
+                self.output += linesep
+            return
+
+    def error(self, message):
+        logger.warning("Parsing error: %s", message)
+
+
+class WikidotLinkParser(HTMLParser):
+    """
+    Collects the (de-duplicated) paths of all links starting with a prefix.
+    """
+    def __init__(self, path_prefix: str):
+        HTMLParser.__init__(self)
+        self.path_prefix = path_prefix
+        self.paths = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            for (attribute_key, attribute_value) in attrs:
+                if attribute_key == 'href' and attribute_value and attribute_value.startswith(self.path_prefix):
+                    path = attribute_value[1:]
+                    if path not in self.paths:
+                        self.paths.append(path)
@@ -1,19 +1,150 @@
+import asyncio
+import logging
+import os
 import re
+import socket
+import time
 import urllib.request
-from html.parser import HTMLParser
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from os import linesep
 from typing import Optional
-from urllib.error import HTTPError
+from urllib.error import HTTPError, URLError
 
-from interactions import BrandColors, Embed, Extension, OptionType, SlashContext, slash_command, slash_option
+from interactions import BrandColors, Embed, Extension, OptionType, SlashCommandChoice, SlashContext, listen, \
+    slash_command, slash_option
 
+import admission
+import metrics
+import sharding
 import utils
+from bot_logging import fields
+from shared_cache import SHARED_CACHE
+from spell_index import SCHOOLS, SpellIndex, SpellRecord, save_records
+from wikidot_parser import parse_wikidot_html, parse_wikidot_links
+
+logger = logging.getLogger(__name__)
 
 WIKIDOT_URL_PREFIX = "http://dnd5e.wikidot.com/"
-DIVS_TO_PARSE = ['page-title page-header', 'page-content']
+
+# Magic items live under several Wikidot categories, most of them under the first. For names without a known category,
+# the most likely category is tried first, then the rest a few at a time.
+ITEM_CATEGORIES = ["Wondrous Items", "Armor", "Weapons", "Rings", "Potions", "Rods", "Scrolls", "Staffs", "Wands"]
+# Words in item names that suggest their category, e.g. "Ring of Protection" or "Flame Tongue Longsword".
+ITEM_CATEGORY_HINTS = {
+    "Armor": ["armor", "plate", "mail", "shield", "breastplate", "shirt"],
+    "Weapons": ["sword", "blade", "axe", "bow", "dagger", "mace", "hammer", "spear", "arrow", "scimitar", "trident",
+                "whip", "weapon", "javelin", "glaive", "halberd", "pike", "flail", "rapier", "sling"],
+    "Rings": ["ring"],
+    "Potions": ["potion", "philter", "elixir", "oil"],
+    "Rods": ["rod"],
+    "Scrolls": ["scroll"],
+    "Staffs": ["staff"],
+    "Wands": ["wand"],
+}
+MAX_CONCURRENT_ITEM_CATEGORY_REQUESTS = 3
+
+# Discord allows at most 25 fields per embed; this keeps spell comparisons readable well within that.
+MAX_COMPARED_SPELLS = 9
+# Discord's limit on the total characters in an embed.
+EMBED_CHARACTER_LIMIT = 6000
+
+# Blocking Wikidot requests run on this pool, so they don't stall the event loop. Requests that are cancelled before
+# they start are dropped from the queue. This pool and the caches below are kept when the extension is hot reloaded.
+wikidot_executor = utils.keep_across_reloads(__name__, "wikidot_executor", lambda: ThreadPoolExecutor(
+    max_workers=len(ITEM_CATEGORIES) * 2, thread_name_prefix="wikidot"))
+
+# Parsing a large page takes tens of milliseconds, and holds the GIL on the Wikidot threads while the event loop is
+# trying to run. With PARSE_WORKERS set, pages of at least PARSE_OFFLOAD_MIN_BYTES are parsed in that many worker
+# processes instead; smaller pages are cheaper to parse on a Wikidot thread than to send to another process.
+PARSE_OFFLOAD_MIN_BYTES = 16 * 1024
+parse_workers = int(os.getenv("PARSE_WORKERS", "0"))
+parse_pool: Optional[utils.ProcessOffloadPool] = utils.keep_across_reloads(
+    __name__, "parse_pool", lambda: utils.ProcessOffloadPool(parse_workers) if parse_workers > 0 else None)
+
+metrics.register_gauge("fcg_wikidot_parse_queue_depth", lambda: parse_pool.queue_depth if parse_pool else 0)
+
+# The category each item name (in Wikidot URL format) was last found in. Also kept in the shared cache.
+item_category_by_name: dict[str, str] = utils.keep_across_reloads(__name__, "item_category_by_name", dict)
+
+WIKIDOT_TIMEOUT_SECONDS = 5
+
+# Parsed page text by Wikidot path. Stale pages are still served while Wikidot is unavailable. Pages missing here are
+# looked for in the shared cache, which other shard processes also fill, before they are fetched.
+page_cache = utils.keep_across_reloads(__name__, "page_cache", lambda: utils.TtlCache(
+    ttl=6 * 60 * 60, max_entries=500))
+# Paths that recently returned 404, so misspelled names don't cost a request every time.
+missing_page_cache = utils.keep_across_reloads(__name__, "missing_page_cache", lambda: utils.TtlCache(
+    ttl=5 * 60, max_entries=1000))
+# Stops sending requests to Wikidot while it is failing.
+wikidot_circuit_breaker = utils.keep_across_reloads(__name__, "wikidot_circuit_breaker", lambda: utils.CircuitBreaker(
+    failure_threshold=3, base_backoff=10, max_backoff=300))
+
+metrics.register_gauge("fcg_wikidot_circuit_open", lambda: int(wikidot_circuit_breaker.is_open()))
+
+# Every parsed spell is added to the local search index. Unless SPELL_INDEX_PRELOAD is disabled, the full spell list is
+# also fetched slowly in the background by the first shard, skipping spells already loaded from SPELL_INDEX_FILE, so
+# searches cover spells nobody has looked up yet. Preloaded pages bypass the page caches, so they don't push out pages
+# that users actually look up.
+spell_index = utils.keep_across_reloads(__name__, "spell_index", SpellIndex)
+SPELL_LIST_PATH = "spells"
+SPELL_INDEX_PRELOAD_DELAY_SECONDS = 1
+SPELL_SEARCH_RESULT_LIMIT = 10
+
+# Each guild's spell and item lookups are counted in the shared cache. With LOOKUP_PREWARM enabled, the most frequent
+# lookups of this shard's guilds are fetched at startup, and a guild's again shortly before each of its DnD sessions.
+PREWARM_LOOKUP_LIMIT = 25
+PREWARM_LEAD_SECONDS = 30 * 60
+PREWARM_DELAY_SECONDS = 0.5
+# Session prewarms waiting to run, by (guild ID, session start). Kept when the extension is hot reloaded.
+scheduled_prewarms: dict[tuple, asyncio.Task] = utils.keep_across_reloads(__name__, "scheduled_prewarms", dict)
+
+
+class WikidotLookupError(Exception):
+    """
+    A Wikidot lookup failed. The message is suitable for showing to users.
+    """
+
+
+class WikidotPageNotFound(WikidotLookupError):
+    pass
+
+
+class WikidotUnavailable(WikidotLookupError):
+    def __init__(self):
+        super().__init__("Wikidot isn't responding right now. Please try again in a few minutes.")
 
 
 class WikidotExtension(Extension):
+    @listen()
+    async def on_startup(self):
+        if parse_pool is not None:
+            asyncio.get_running_loop().create_task(parse_pool.start())
+        spell_index.load()
+        # Only one shard writes the index file; the others pick it up when they next start.
+        if os.getenv("SPELL_INDEX_PRELOAD", "true").lower() in ("1", "true", "yes") \
+                and sharding.shard_id() == 0:
+            asyncio.get_running_loop().create_task(preload_spell_index())
+
+        if lookup_prewarm_enabled():
+            guild_ids = [guild_id for guild_id in await SHARED_CACHE.lookup_guild_ids()
+                         if sharding.owns_guild(self.bot, guild_id)]
+            asyncio.get_running_loop().create_task(prewarm_lookups(guild_ids))
+
+    @listen("dnd_session_scheduled")
+    async def on_dnd_session_scheduled(self, event):
+        if not lookup_prewarm_enabled():
+            return
+
+        key = (event.guild_id, event.start)
+        if key in scheduled_prewarms and not scheduled_prewarms[key].done():
+            return
+        delay = event.start.timestamp() - time.time() - PREWARM_LEAD_SECONDS
+        task = asyncio.get_running_loop().create_task(prewarm_lookups([event.guild_id], delay=max(0.0, delay)))
+        scheduled_prewarms[key] = task
+        task.add_done_callback(lambda _: scheduled_prewarms.pop(key, None))
+
     @slash_command(
         name="spell_lookup",
         description="Look up a DnD 5e spell",
@@ -26,10 +157,21 @@ class WikidotExtension(Extension):
         required=True,
         opt_type=OptionType.STRING,
     )
+    @metrics.timed()
+    @admission.admitted()
     async def spell_lookup(self, ctx: SlashContext, spell_name: str):
-        card: Embed = get_dnd_spell_card(spell_name)
+        # Acknowledge immediately so a slow Wikidot response can't blow the interaction deadline. Commands that waited
+        # for admission may already have been auto-deferred.
+        if not ctx.deferred:
+            await ctx.defer()
+        try:
+            spell = await fetch_dnd_spell(spell_name)
+        except WikidotLookupError as error:
+            await ctx.send(f"Error: {error}")
+            return
 
-        await ctx.send(embeds=card)
+        await ctx.send(embeds=spell.make_card())
+        record_lookup(ctx, "spell", spell_name)
 
     @slash_command(
         name="item_lookup",
@@ -43,32 +185,358 @@ class WikidotExtension(Extension):
         required=True,
         opt_type=OptionType.STRING,
     )
+    @metrics.timed()
+    @admission.admitted()
     async def item_lookup(self, ctx: SlashContext, item_name: str):
-        card: Embed = get_dnd_item_card(item_name)
+        # Acknowledge immediately so a slow Wikidot response can't blow the interaction deadline. Commands that waited
+        # for admission may already have been auto-deferred.
+        if not ctx.deferred:
+            await ctx.defer()
+        try:
+            item = await fetch_dnd_item(item_name)
+        except WikidotLookupError as error:
+            await ctx.send(f"Error: {error}")
+            return
 
-        await ctx.send(embeds=card)
+        await ctx.send(embeds=item.make_card())
+        record_lookup(ctx, "item", item_name)
 
+    @slash_command(
+        name="spell_compare",
+        description="Compare several DnD 5e spells side by side",
+        # Global command; allows this to be used in bot DMs.
+        dm_permission=True,
+    )
+    @slash_option(
+        name="spell_names",
+        description=f"Up to {MAX_COMPARED_SPELLS} spell names, separated by commas.",
+        required=True,
+        opt_type=OptionType.STRING,
+    )
+    @metrics.timed()
+    @admission.admitted(cost=2)
+    async def spell_compare(self, ctx: SlashContext, spell_names: str):
+        names = [name.strip() for name in spell_names.split(',') if name.strip()]
+        if not names or len(names) > MAX_COMPARED_SPELLS:
+            await utils.send_ephemeral(ctx, f"Error: Please give between 1 and {MAX_COMPARED_SPELLS} spell names.")
+            return
 
-def setup(bot):
-    WikidotExtension(bot)
+        if not ctx.deferred:
+            await ctx.defer()
+        # Fetch all spells concurrently; failures are reported alongside the spells that were found.
+        results = await asyncio.gather(*[fetch_dnd_spell(name) for name in names], return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(result, WikidotLookupError):
+                raise result
 
+        await ctx.send(embeds=make_spell_comparison_card(names, results))
 
-def get_dnd_spell_text(spell_name: str) -> str:
-    wikidot_path = get_wikidot_path("spell", spell_name)
+    @slash_command(
+        name="spell_search",
+        description="Search DnD 5e spells by what they do",
+        # Global command; allows this to be used in bot DMs.
+        dm_permission=True,
+    )
+    @slash_option(
+        name="query",
+        description="Words to search spell names and descriptions for.",
+        required=False,
+        opt_type=OptionType.STRING,
+    )
+    @slash_option(
+        name="school",
+        description="Only show spells of this school.",
+        required=False,
+        opt_type=OptionType.STRING,
+        choices=[SlashCommandChoice(name=school.capitalize(), value=school) for school in SCHOOLS],
+    )
+    @slash_option(
+        name="level",
+        description="Only show spells of this level (0 for cantrips).",
+        required=False,
+        opt_type=OptionType.INTEGER,
+        min_value=0,
+        max_value=9,
+    )
+    @slash_option(
+        name="spell_class",
+        description="Only show spells on this class's spell list.",
+        required=False,
+        opt_type=OptionType.STRING,
+    )
+    @slash_option(
+        name="components",
+        description="Only show spells needing no components beyond these, e.g. \"V, S\".",
+        required=False,
+        opt_type=OptionType.STRING,
+    )
+    @metrics.timed()
+    @admission.admitted()
+    async def spell_search(self, ctx: SlashContext, query: str = "", school: str = None, level: int = None,
+                           spell_class: str = None, components: str = None):
+        component_filter = None
+        if components is not None:
+            component_filter = [component.strip().upper() for component in re.split("[, ]+", components)]
 
-    try:
-        return get_wikidot_page_text(wikidot_path)
-    except HTTPError:
-        return f"Error: Could not find a DnD 5e spell named **{spell_name}**."
+        results = spell_index.search(query, limit=SPELL_SEARCH_RESULT_LIMIT, school=school, level=level,
+                                     spell_class=spell_class, components=component_filter)
 
+        await ctx.send(embeds=make_spell_search_card(query, results))
 
-def get_wikidot_text(category: str, name: str) -> str:
-    wikidot_path = get_wikidot_path(category, name)
+
+def setup(bot):
+    WikidotExtension(bot)
+
+
+async def preload_spell_index():
+    """
+    Fetches every spell on the Wikidot spell list that isn't indexed yet, one at a time, so the search index covers all
+    spells without competing with user lookups.
+    """
+    try:
+        spell_list_html = await run_in_wikidot_executor(get_wikidot_html, SPELL_LIST_PATH)
+    except (URLError, socket.timeout, ConnectionError) as error:
+        logger.warning("Could not fetch the Wikidot spell list: %s", error)
+        return
+    spell_paths = await run_parser(parse_wikidot_links, spell_list_html, "/spell:")
+
+    indexed_paths = {get_wikidot_path("Spell", record.name) for record in spell_index.records.values()}
+    missing_paths = [path for path in spell_paths if path not in indexed_paths]
+    logger.info("Preloading %s spells into the spell search index", len(missing_paths))
+
+    for count, path in enumerate(missing_paths, start=1):
+        try:
+            if not wikidot_circuit_breaker.allow_request():
+                raise WikidotUnavailable()
+            index_spell(DndSpell(await download_wikidot_page_text(path)))
+        except WikidotUnavailable:
+            logger.warning("Stopping spell index preload; Wikidot is unavailable")
+            break
+        except Exception as error:
+            # Some pages don't follow the usual spell layout.
+            logger.debug("Could not index spell page %s: %s", path, error)
+
+        if count % 25 == 0:
+            await save_spell_index()
+        await asyncio.sleep(SPELL_INDEX_PRELOAD_DELAY_SECONDS)
+
+    await save_spell_index()
+    logger.info("Spell search index contains %s spells", len(spell_index))
+
+
+async def save_spell_index():
+    # Writing the whole index takes a while, so it's done on a Wikidot thread, from a copy of the records since lookups
+    # can add spells meanwhile.
+    await run_in_wikidot_executor(save_records, list(spell_index.records.values()))
+
+
+def lookup_prewarm_enabled() -> bool:
+    return os.getenv("LOOKUP_PREWARM", "true").lower() in ("1", "true", "yes")
+
+
+def record_lookup(ctx: SlashContext, kind: str, name: str):
+    # Lookups in DMs aren't tied to a campaign, so only guild lookups are counted. The write runs on the shared cache's
+    # worker thread, so it doesn't hold up the event loop.
+    if ctx.guild_id:
+        SHARED_CACHE.record_lookup(ctx.guild_id, kind, wikidot_url_format(name))
+
+
+async def prewarm_lookups(guild_ids: [str], delay: float = 0):
+    """
+    Fetches the guilds' most frequent spell and item lookups one at a time in the background, so that their next
+    lookups are served from the page cache.
+    :param guild_ids: The guilds whose lookups to prewarm.
+    :param delay: Seconds to wait before starting.
+    """
+    await asyncio.sleep(delay)
+    lookups = await SHARED_CACHE.top_lookups(guild_ids, PREWARM_LOOKUP_LIMIT)
+    if lookups:
+        logger.info("Prewarming frequent lookups", extra=fields(guilds=len(guild_ids), lookups=len(lookups)))
+
+    for kind, name in lookups:
+        try:
+            await (fetch_dnd_spell(name) if kind == "spell" else fetch_dnd_item(name))
+        except WikidotUnavailable:
+            logger.warning("Stopping lookup prewarm; Wikidot is unavailable")
+            break
+        except Exception as error:
+            logger.debug("Could not prewarm %s %s: %s", kind, name, error)
+        # Leave Wikidot and the event loop to user lookups.
+        await asyncio.sleep(PREWARM_DELAY_SECONDS)
+
+
+def index_spell(spell: "DndSpell"):
+    spell_index.add(SpellRecord.from_spell(spell))
+
+
+async def fetch_wikidot_page_text(page_path: str) -> str:
+    """
+    Gets a page's parsed text, from the page cache if possible. Known missing pages fail fast, as do all uncached
+    pages while the circuit breaker is open.
+    :raises WikidotPageNotFound: If the page doesn't exist.
+    :raises WikidotUnavailable: If Wikidot is failing or timing out.
+    """
+    cached_text = page_cache.get(page_path)
+    metrics.record_cache("wikidot_pages", cached_text is not None)
+    if cached_text is not None:
+        return cached_text
+
+    shared_text = await get_shared_page_text(page_path)
+    metrics.record_cache("wikidot_shared_pages", shared_text is not None)
+    if shared_text is not None:
+        return shared_text
+
+    if page_path in missing_page_cache:
+        metrics.record_cache("wikidot_missing_pages", True)
+        raise WikidotPageNotFound(page_path)
 
     try:
-        return get_wikidot_page_text(wikidot_path)
-    except HTTPError:
-        return f"Error: Could not find **{name}** in category **{category}**."
+        if not wikidot_circuit_breaker.allow_request():
+            raise WikidotUnavailable()
+        text = await download_wikidot_page_text(page_path)
+    except WikidotUnavailable:
+        stale_text = await get_stale_page_text(page_path)
+        if stale_text is not None:
+            return stale_text
+        raise
+
+    page_cache.put(page_path, text)
+    SHARED_CACHE.put_page(page_path, text)
+    return text
+
+
+async def download_wikidot_page_text(page_path: str) -> str:
+    """
+    Fetches and parses a page from Wikidot, bypassing the page caches, and records the outcome on the circuit breaker.
+    Callers should check the circuit breaker first.
+    :raises WikidotPageNotFound: If the page doesn't exist.
+    :raises WikidotUnavailable: If Wikidot is failing or timing out.
+    """
+    try:
+        html = await run_in_wikidot_executor(get_wikidot_html, page_path)
+    except HTTPError as error:
+        if error.code == 404:
+            # Wikidot answered, so it's healthy; the page just doesn't exist.
+            wikidot_circuit_breaker.record_success()
+            metrics.record_cache("wikidot_missing_pages", False)
+            missing_page_cache.put(page_path, True)
+            raise WikidotPageNotFound(page_path) from error
+        wikidot_circuit_breaker.record_failure()
+        raise WikidotUnavailable() from error
+    except (URLError, socket.timeout, ConnectionError) as error:
+        logger.warning("Wikidot request failed: %s", error)
+        wikidot_circuit_breaker.record_failure()
+        raise WikidotUnavailable() from error
+
+    wikidot_circuit_breaker.record_success()
+    return await run_parser(parse_wikidot_html, html)
+
+
+async def get_shared_page_text(page_path: str, allow_stale: bool = False) -> Optional[str]:
+    """
+    :return: The page's text from the shared cache, or None if it isn't there (or has expired, unless allow_stale).
+    Fresh pages are copied into this process's page cache until they expire.
+    """
+    shared_page = await SHARED_CACHE.get_page(page_path)
+    if shared_page is None:
+        return None
+
+    text, fetched_at = shared_page
+    remaining_ttl = page_cache.ttl - (time.time() - fetched_at)
+    if remaining_ttl > 0:
+        page_cache.put(page_path, text, ttl=remaining_ttl)
+    elif not allow_stale:
+        return None
+    return text
+
+
+async def get_stale_page_text(page_path: str) -> Optional[str]:
+    stale_text = page_cache.get(page_path, allow_stale=True)
+    if stale_text is None:
+        stale_text = await get_shared_page_text(page_path, allow_stale=True)
+    return stale_text
+
+
+async def run_in_wikidot_executor(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(wikidot_executor, func, *args)
+
+
+async def run_parser(parse, html: bytes, *args):
+    """
+    Runs a wikidot_parser function on a page's HTML, in a parse worker process if the page is large enough to be worth
+    it, otherwise on a Wikidot thread.
+    """
+    if parse_pool is not None and len(html) >= PARSE_OFFLOAD_MIN_BYTES:
+        try:
+            return await parse_pool.run(parse, html, *args)
+        except BrokenProcessPool:
+            logger.warning("A Wikidot parse worker died; parsing on a Wikidot thread instead")
+    return await run_in_wikidot_executor(parse, html, *args)
+
+
+async def resolve_item_text(item_name: str) -> str:
+    """
+    Finds a magic item's page text. Names with a remembered category are fetched directly. Otherwise the most likely
+    category is requested first, then the others up to MAX_CONCURRENT_ITEM_CATEGORY_REQUESTS at a time; the first page
+    found wins and the remaining requests are cancelled.
+    """
+    item_key = wikidot_url_format(item_name)
+
+    known_category = item_category_by_name.get(item_key) or await SHARED_CACHE.get_item_category(item_key)
+    metrics.record_cache("item_category", known_category is not None)
+    if known_category is not None:
+        try:
+            return await fetch_wikidot_page_text(get_wikidot_path(known_category, item_name))
+        except WikidotPageNotFound:
+            # The page has moved; fall back to searching every category.
+            item_category_by_name.pop(item_key, None)
+            SHARED_CACHE.remove_item_category(item_key)
+
+    remaining_categories = get_item_category_candidates(item_name)
+    category_by_task: dict[asyncio.Future, str] = {}
+    pending = set()
+    max_requests = 1
+    lookup_error: Optional[WikidotLookupError] = None
+    try:
+        while pending or remaining_categories:
+            while remaining_categories and len(pending) < max_requests:
+                category = remaining_categories.pop(0)
+                task = asyncio.ensure_future(fetch_wikidot_page_text(get_wikidot_path(category, item_name)))
+                category_by_task[task] = category
+                pending.add(task)
+            # The likeliest category goes alone; once it misses, the others are hedged.
+            max_requests = MAX_CONCURRENT_ITEM_CATEGORY_REQUESTS
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    item_category_by_name[item_key] = category_by_task[task]
+                    SHARED_CACHE.put_item_category(item_key, category_by_task[task])
+                    return task.result()
+                if not isinstance(task.exception(), WikidotPageNotFound):
+                    # Keep waiting, another category may still succeed.
+                    lookup_error = lookup_error or task.exception()
+    finally:
+        for task in category_by_task:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # Mark the losing requests' failures as handled.
+                task.exception()
+
+    if lookup_error is not None:
+        raise lookup_error
+    raise WikidotPageNotFound(f"Could not find a DnD 5e magic item named **{item_name}**.")
+
+
+def get_item_category_candidates(item_name: str) -> [str]:
+    """
+    :return: Every item category, with the ones hinted at by the item's name (see ITEM_CATEGORY_HINTS) first.
+    """
+    words = item_name.lower().replace('-', ' ').split()
+    hinted_categories = [category for (category, hints) in ITEM_CATEGORY_HINTS.items()
+                         if any(word.endswith(hint) for word in words for hint in hints)]
+    return hinted_categories + [category for category in ITEM_CATEGORIES if category not in hinted_categories]
 
 
 def get_wikidot_path(category: str, name: str) -> str:
@@ -81,118 +549,26 @@ def wikidot_url_format(url_component: str) -> str:
     return re.sub("[^A-Za-z-]+", '', formatted_url_component)
 
 
-def get_wikidot_page_text(page_path: str) -> str:
-    html = get_wikidot_html(page_path)
-    return parse_wikidot_html(html)
-
-
 def get_wikidot_html(page_path: str) -> bytes:
     url = WIKIDOT_URL_PREFIX + page_path
-    print(f"Looking up Wikidot URL: {url}")
-
-    page = urllib.request.urlopen(url)
-    return page.read()
+    logger.debug("Looking up Wikidot URL: %s", url)
 
+    with metrics.track_upstream("wikidot"):
+        page = urllib.request.urlopen(url, timeout=WIKIDOT_TIMEOUT_SECONDS)
+        return page.read()
 
-def parse_wikidot_html(html_content: bytes) -> str:
-    print("Parsing Wikidot HTML content")
-    parser = WikidotHtmlParser()
-    parser.feed(html_content.decode('utf-8'))
-    parser.close()
 
-    return parser.output
-
-
-class WikidotHtmlParser(HTMLParser):
-    def __init__(self):
-        HTMLParser.__init__(self)
-
-        # Initialize parsing fields
-        self.output = ""
-        self.current_parsing_div_level = -1
-        self.div_level = 0
-
-    def is_parsing_content_div(self):
-        return self.current_parsing_div_level != -1
-
-    def feed(self, data):
-        # Reset parsing fields
-        self.output = ""
-        self.current_parsing_div_level = -1
-        self.div_level = 0
-
-        super(WikidotHtmlParser, self).feed(data)
-
-    def handle_data(self, data: str):
-        # Only parse data within the main-content div.
-        if self.is_parsing_content_div():  # and 'nitroAds' not in data:
-            self.output += data.strip()
-
-    def handle_starttag(self, tag, attrs):
-        if tag == 'div':
-            for (attribute_key, attribute_value) in attrs:
-                if attribute_key == 'class' or attribute_key == 'id':
-                    if attribute_value in DIVS_TO_PARSE and not self.is_parsing_content_div():
-                        self.current_parsing_div_level = self.div_level
-
-            self.div_level += 1
-
-        if self.is_parsing_content_div():
-            if tag == 'strong':
-                self.output += '**'
-            if tag == 'em':
-                self.output += '*'
-            if tag == 'br':
-                self.output += linesep
-            if tag == 'p':
-                self.output += linesep
-            if tag == 'span':
-                self.output += '__**'
-            if tag == 'th':
-                self.output += '__ '
-            if tag == 'li':
-                self.output += '• '
-            if tag == 'a':
-                self.output += ' '
-            return
-
-    def handle_endtag(self, tag):
-        if tag == 'div':
-            self.div_level -= 1
-
-            # Check if this closes any tracked divs.
-            if self.div_level == self.current_parsing_div_level:
-                self.current_parsing_div_level = -1
-        elif self.is_parsing_content_div():
-            if tag == 'strong':
-                self.output += '** '
-            if tag == 'em':
-                self.output += '* '
-            if tag == 'p':
-                self.output += linesep
-            if tag == 'span':
-                self.output += '**__'
-            if tag == 'tr':
-                self.output += linesep
-            if tag == 'th':
-                self.output += '__\t\t\t'
-            if tag == 'td':
-                self.output += '\t\t\t'
-            if tag == 'li':
-                self.output += linesep
-            return
-
-    def error(self, message):
-        print(f"Parsing error: {message}")
-
-
-class DndWikidotCard:
+class DndWikidotCard(ABC):
     # This is the Braille 'blank' character. It's a hacky way to satisfy the requirement that Field titles aren't empty.
     EMPTY_FIELD_TITLE_CHARACTER = '⠀'
 
     def __init__(self, lines: [str]):
         self.lines = lines
 
+    @abstractmethod
+    def make_card(self) -> Embed:
+        pass
+
     def find_line(self, line_prefix: str) -> Optional[str]:
         return next(line for line in self.lines if line.startswith(line_prefix))
 
@@ -234,8 +610,7 @@ class DndSpell(DndWikidotCard):
         'transmutation': 'https://media-waterdeep.cursecdn.com/attachments/2/722/transmutation.png',
     }
 
-    def __init__(self, spell_name: str):
-        spell_text = get_wikidot_text("Spell", spell_name)
+    def __init__(self, spell_text: str):
         self.lines = spell_text.split(linesep)
         DndWikidotCard.__init__(self, lines=self.lines)
 
@@ -268,6 +643,8 @@ class DndSpell(DndWikidotCard):
         card.add_field(name="Duration", value=self.duration[14:], inline=True)
         card.add_field(name="Components", value=self.components[16:], inline=True)
 
+        card.set_footer(text=self.source, icon_url=self.get_school_image_url())
+
         self.add_long_text_as_multiple_fields(card, "Description", self.description_lines)
 
         card.add_field(name="Spell Lists", value=self.spell_lists[19:], inline=False)
@@ -275,13 +652,86 @@ class DndSpell(DndWikidotCard):
         if len(self.extra_lines) > 1:
             self.add_long_text_as_multiple_fields(card, self.extra_lines[0], self.extra_lines[1:])
 
-        card.set_footer(text=self.source, icon_url=self.get_school_image_url())
-
         return card
 
 
-def get_dnd_spell_card(spell_name: str) -> Embed:
-    return DndSpell(spell_name).make_card()
+async def fetch_dnd_spell(spell_name: str) -> DndSpell:
+    try:
+        spell = DndSpell(await fetch_wikidot_page_text(get_wikidot_path("Spell", spell_name)))
+    except WikidotPageNotFound as error:
+        raise WikidotPageNotFound(f"Could not find a DnD 5e spell named **{spell_name}**.") from error
+
+    if spell_name not in spell_index:
+        index_spell(spell)
+    return spell
+
+
+def make_spell_search_card(query: str, results: [SpellRecord]) -> Embed:
+    card = Embed(
+        title=f"Spell Search: {query}" if query else "Spell Search",
+        color=BrandColors.YELLOW,
+    )
+
+    if results:
+        card.description = linesep.join(f"**{record.name}** - {record.classification}" for record in results)
+    else:
+        card.description = "No matching spells found."
+    card.set_footer(text=f"Searched {len(spell_index)} indexed spells")
+
+    return card
+
+
+def make_spell_comparison_card(names: [str], spells: ["DndSpell | WikidotLookupError"]) -> Embed:
+    """
+    Makes a card with one column per spell, showing its classification and casting details. Spells that weren't found,
+    and those that couldn't be looked up because Wikidot is unavailable, are listed at the end.
+    :param names: The requested spell names.
+    :param spells: The spell, or the lookup error, for each name.
+    """
+    card = Embed(
+        title="Spell Comparison",
+        color=BrandColors.YELLOW,
+    )
+
+    not_found_errors = []
+    unavailable_names = []
+    unavailable_error: Optional[WikidotLookupError] = None
+    for name, spell in zip(names, spells):
+        if isinstance(spell, WikidotPageNotFound):
+            not_found_errors.append(str(spell))
+            continue
+        if isinstance(spell, WikidotLookupError):
+            unavailable_names.append(f"**{name}**")
+            unavailable_error = spell
+            continue
+
+        details = linesep.join([
+            spell.classification,
+            f"**Casting Time:** {spell.cast_time[18:]}",
+            f"**Range:** {spell.range[11:]}",
+            f"**Components:** {spell.components[16:]}",
+            f"**Duration:** {spell.duration[14:]}",
+        ])
+        field_name = spell.name.strip('_*')
+        # Keep the whole card within Discord's total embed size by trimming long material components.
+        field_value = details[:min(1024, EMBED_CHARACTER_LIMIT // (MAX_COMPARED_SPELLS + 1) - len(field_name))]
+        card.add_field(name=field_name, value=field_value, inline=True)
+
+    if not_found_errors:
+        add_field_within_embed_limit(card, "Not Found", linesep.join(not_found_errors))
+    if unavailable_names:
+        add_field_within_embed_limit(card, "Unavailable", f"{', '.join(unavailable_names)}: {unavailable_error}")
+
+    return card
+
+
+def add_field_within_embed_limit(card: Embed, name: str, value: str):
+    """
+    Adds a full-width field, truncating its value to fit both the field limit and Discord's total embed size.
+    """
+    value_limit = min(1024, EMBED_CHARACTER_LIMIT - len(card) - len(name))
+    if value_limit > 0:
+        card.add_field(name=name, value=value[:value_limit], inline=False)
 
 
 class DndItem(DndWikidotCard):
@@ -299,8 +749,7 @@ class DndItem(DndWikidotCard):
             'https://www.dndbeyond.com/content/1-0-1989-0/skins/waterdeep/images/icons/item_types/wondrousitem.jpg',
     }
 
-    def __init__(self, item_name: str):
-        item_text = get_wikidot_text("Wondrous Items", item_name)
+    def __init__(self, item_text: str):
         self.lines = item_text.split(linesep)
         DndWikidotCard.__init__(self, lines=self.lines)
 
@@ -311,7 +760,7 @@ class DndItem(DndWikidotCard):
         self.metadata_line = further_lines[1]
         self.description_lines = further_lines[2:]
 
-        self.item_type, remaining_metadata = self.metadata_line.strip('*').split(',', 1)
+        self.item_type, remaining_metadata = self.split_metadata(self.metadata_line.strip('*'))
         if '(requires attunement' in remaining_metadata:
             attunement_start = remaining_metadata.index('(requires attunement')
             self.rarity = remaining_metadata[:attunement_start - 1]
@@ -320,8 +769,26 @@ class DndItem(DndWikidotCard):
             self.rarity = remaining_metadata
             self.attunement = None
 
+    @staticmethod
+    def split_metadata(metadata: str) -> (str, str):
+        """
+        Splits an item's metadata into its type and the rest at the first comma outside parentheses, since types can
+        have qualifiers like "Armor (medium or heavy, but not hide)".
+        """
+        depth = 0
+        for index, character in enumerate(metadata):
+            if character == '(':
+                depth += 1
+            elif character == ')':
+                depth = max(0, depth - 1)
+            elif character == ',' and depth == 0:
+                return metadata[:index], metadata[index + 1:]
+        return metadata, ""
+
     def get_item_type_image_url(self):
-        return DndItem.ITEM_TYPE_TO_IMAGE_MAP[self.item_type.lower()]
+        # Ignore qualifiers like "Weapon (any sword)", and use the wondrous item image for any unrecognized types.
+        base_item_type = self.item_type.split('(', 1)[0].strip().lower()
+        return DndItem.ITEM_TYPE_TO_IMAGE_MAP.get(base_item_type, DndItem.ITEM_TYPE_TO_IMAGE_MAP['wondrous item'])
 
     def make_card(self) -> Embed:
         card = Embed(
@@ -330,16 +797,17 @@ class DndItem(DndWikidotCard):
         )
 
         card.add_field(name="Item Type", value=self.item_type, inline=True)
-        card.add_field(name="Rarity", value=self.rarity, inline=True)
+        if self.rarity.strip():
+            card.add_field(name="Rarity", value=self.rarity, inline=True)
         if self.attunement:
             card.add_field(name="Attunement", value=self.attunement, inline=True)
 
-        self.add_long_text_as_multiple_fields(card, "Description", self.description_lines)
-
         card.set_footer(text=self.source, icon_url=self.get_item_type_image_url())
 
+        self.add_long_text_as_multiple_fields(card, "Description", self.description_lines)
+
         return card
 
 
-def get_dnd_item_card(item_name: str) -> Embed:
-    return DndItem(item_name).make_card()
+async def fetch_dnd_item(item_name: str) -> DndItem:
+    return DndItem(await resolve_item_text(item_name))
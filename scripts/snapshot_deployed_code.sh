@@ -0,0 +1,13 @@
+#!/bin/bash
+# Keeps a copy of the currently deployed code, so start_or_reload_service.sh can tell what this deployment changes.
+PREVIOUS_DIR=/tmp/fresh-cut-grass-previous
+
+echo "Saving a copy of the deployed FreshCutGrass code"
+rm -rf "$PREVIOUS_DIR"
+mkdir -p "$PREVIOUS_DIR/main"
+if [ -d /home/ec2-user/fresh-cut-grass/main ]; then
+  cp -r /home/ec2-user/fresh-cut-grass/main/. "$PREVIOUS_DIR/main"
+fi
+if [ -f /lib/systemd/system/FreshCutGrass.service ]; then
+  cp /lib/systemd/system/FreshCutGrass.service "$PREVIOUS_DIR/"
+fi
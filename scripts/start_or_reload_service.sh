@@ -0,0 +1,40 @@
+#!/bin/bash
+# Starts FreshCutGrass.service, or restarts it if this deployment changed it. If the bot is already running and only
+# its hot-reloadable extensions changed (see RELOADABLE_EXTENSIONS in main/hot_reload.py), they are reloaded in place
+# instead, so the bot stays connected to Discord.
+PREVIOUS_DIR=/tmp/fresh-cut-grass-previous
+DEPLOYED_DIR=/home/ec2-user/fresh-cut-grass
+RELOADABLE_FILES=" dnd_calendar.py polls.py wikidot_scraper.py "
+
+if ! systemctl is-active --quiet FreshCutGrass.service; then
+  echo "Enabling FreshCutGrass.service"
+  systemctl enable --now FreshCutGrass.service
+  exit
+fi
+
+changed_files=""
+for file in $( (ls -A "$PREVIOUS_DIR/main"; ls -A "$DEPLOYED_DIR/main") | sort -u ); do
+  if [ "$file" != "__pycache__" ] && ! cmp -s "$PREVIOUS_DIR/main/$file" "$DEPLOYED_DIR/main/$file"; then
+    changed_files="$changed_files $file"
+  fi
+done
+if ! cmp -s "$PREVIOUS_DIR/FreshCutGrass.service" /lib/systemd/system/FreshCutGrass.service; then
+  changed_files="$changed_files FreshCutGrass.service"
+fi
+
+if [ -z "$changed_files" ]; then
+  echo "No bot files changed; leaving FreshCutGrass.service running"
+  exit
+fi
+
+for file in $changed_files; do
+  if [[ "$RELOADABLE_FILES" != *" $file "* ]]; then
+    echo "Restarting FreshCutGrass.service, since $file changed"
+    systemctl enable FreshCutGrass.service
+    systemctl restart FreshCutGrass.service
+    exit
+  fi
+done
+
+echo "Hot reloading FreshCutGrass extensions:$changed_files"
+systemctl reload FreshCutGrass.service
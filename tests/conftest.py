@@ -0,0 +1,30 @@
+import os
+import sys
+import time
+
+import pytest
+
+# The bot's modules import each other as top-level modules, as they do when run from main/.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "main"))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    """
+    Replaces time.monotonic with a clock that only moves when advanced. Not for use with running event loops, which
+    also read time.monotonic.
+    """
+    fake_clock = FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake_clock)
+    return fake_clock
@@ -0,0 +1,229 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from interactions.client.errors import AlreadyDeferred
+
+import admission
+import wikidot_scraper
+from admission import AdmissionController, AdmissionDenied, FairScheduler, TokenBucket
+
+
+class FakeContext:
+    """
+    Tracks an interaction's responses like interactions' SlashContext, without sending anything.
+    """
+    def __init__(self):
+        self.guild_id = 1
+        self.author = SimpleNamespace(id=2)
+        self.token = "token"
+        self.deferred = False
+        self.responded = False
+        self.ephemeral = False
+        self.deleted_original = False
+        self.sent = []
+        self.client = SimpleNamespace(app=SimpleNamespace(id=3),
+                                      http=SimpleNamespace(delete_interaction_message=self.delete_interaction_message))
+
+    async def defer(self, ephemeral: bool = False):
+        if self.deferred:
+            raise AlreadyDeferred("Interaction has already been responded to.")
+        self.deferred = True
+        self.ephemeral = ephemeral
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append((content, kwargs))
+        self.responded = True
+
+    async def delete_interaction_message(self, application_id, token):
+        self.deleted_original = True
+
+
+def test_token_bucket_starts_full(clock):
+    bucket = TokenBucket(capacity=10, period=60)
+    assert bucket.retry_after(10) == 0
+    assert bucket.retry_after(11) > 0
+
+
+def test_token_bucket_retry_after_waits_for_refill(clock):
+    bucket = TokenBucket(capacity=10, period=60)
+    bucket.take(10)
+    # Refills at 10 tokens a minute, so one token takes 6 seconds.
+    assert bucket.retry_after(1) == pytest.approx(6)
+    clock.advance(3)
+    assert bucket.retry_after(1) == pytest.approx(3)
+    clock.advance(3)
+    assert bucket.retry_after(1) == 0
+
+
+def test_token_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(capacity=10, period=60)
+    bucket.take(5)
+    clock.advance(600)
+    bucket.retry_after(1)
+    assert bucket.tokens == 10
+
+
+def test_token_bucket_refund_is_capped_at_capacity(clock):
+    bucket = TokenBucket(capacity=10, period=60)
+    bucket.take(2)
+    bucket.refund(5)
+    assert bucket.tokens == 10
+
+
+def test_admission_controller_charges_user_before_guild(clock):
+    controller = AdmissionController()
+    for _ in range(10):
+        controller.charge("guild", "user", 1)
+
+    with pytest.raises(AdmissionDenied) as denied:
+        controller.charge("guild", "user", 1)
+    assert denied.value.reason == "user"
+    # Other users in the guild are still admitted.
+    controller.charge("guild", "other user", 1)
+
+
+def test_admission_controller_denied_charges_take_nothing(clock):
+    controller = AdmissionController()
+    for user in range(3):
+        for _ in range(10):
+            controller.charge("guild", user, 1)
+
+    with pytest.raises(AdmissionDenied) as denied:
+        controller.charge("guild", "new user", 1)
+    assert denied.value.reason == "guild"
+    assert controller.user_buckets.get("new user").tokens == 10
+
+
+def test_fair_scheduler_runs_immediately_below_limit():
+    async def run():
+        scheduler = FairScheduler(max_running=2)
+        await scheduler.acquire("a")
+        await scheduler.acquire("b")
+        assert scheduler.running == 2
+        scheduler.release()
+        scheduler.release()
+        assert scheduler.running == 0
+
+    asyncio.run(run())
+
+
+def test_fair_scheduler_takes_waiting_guilds_in_turn():
+    async def run():
+        scheduler = FairScheduler(max_running=1, max_waiting_per_guild=3)
+        await scheduler.acquire("busy")
+        started = []
+
+        async def command(guild_key, name):
+            await scheduler.acquire(guild_key)
+            started.append(name)
+
+        tasks = [asyncio.create_task(command("busy", "busy 1")),
+                 asyncio.create_task(command("busy", "busy 2")),
+                 asyncio.create_task(command("quiet", "quiet 1"))]
+        await asyncio.sleep(0)
+        assert scheduler.waiting_count() == 3
+
+        for _ in tasks:
+            scheduler.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        assert started == ["busy 1", "quiet 1", "busy 2"]
+        assert scheduler.running == 1
+
+    asyncio.run(run())
+
+
+def test_fair_scheduler_turns_away_guilds_with_full_queues():
+    async def run():
+        scheduler = FairScheduler(max_running=1, max_waiting_per_guild=1)
+        await scheduler.acquire("a")
+        waiting = asyncio.create_task(scheduler.acquire("a"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionDenied) as denied:
+            await scheduler.acquire("a")
+        assert denied.value.reason == "busy"
+
+        scheduler.release()
+        await waiting
+
+    asyncio.run(run())
+
+
+def test_fair_scheduler_forgets_cancelled_commands():
+    async def run():
+        scheduler = FairScheduler(max_running=1)
+        await scheduler.acquire("a")
+        waiting = asyncio.create_task(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert scheduler.waiting_count() == 0
+        assert not scheduler.waiting
+
+        scheduler.release()
+        assert scheduler.running == 0
+
+    asyncio.run(run())
+
+
+def test_fair_scheduler_passes_on_slots_handed_to_cancelled_commands():
+    async def run():
+        scheduler = FairScheduler(max_running=1)
+        await scheduler.acquire("a")
+        cancelled = asyncio.create_task(scheduler.acquire("b"))
+        next_command = asyncio.create_task(scheduler.acquire("c"))
+        await asyncio.sleep(0)
+
+        # The slot is handed to "b" just before it's cancelled, so it goes to "c" instead.
+        scheduler.release()
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        await next_command
+        assert scheduler.running == 1
+
+    asyncio.run(run())
+
+
+async def fetch_fake_spell(spell_name: str):
+    return SimpleNamespace(make_card=lambda: f"{spell_name} card")
+
+
+async def run_queued_past_auto_defer(command, *args) -> FakeContext:
+    """
+    Runs a command that has to wait for the only running slot, and is auto-deferred while it waits.
+    """
+    admission.CONTROLLER.scheduler = FairScheduler(max_running=1)
+    await admission.CONTROLLER.scheduler.acquire("other guild")
+    ctx = FakeContext()
+    task = asyncio.create_task(command.callback(None, ctx, *args))
+    await asyncio.sleep(0)
+    assert admission.CONTROLLER.scheduler.waiting_count() == 1
+
+    # What the client's AutoDefer does once the command has run for its time_until_defer.
+    await ctx.defer()
+    admission.CONTROLLER.scheduler.release()
+    await task
+    return ctx
+
+
+def test_lookup_queued_past_auto_defer_still_replies(monkeypatch):
+    monkeypatch.setattr(admission, "CONTROLLER", AdmissionController())
+    monkeypatch.setattr(wikidot_scraper, "fetch_dnd_spell", fetch_fake_spell)
+    monkeypatch.setattr(wikidot_scraper, "record_lookup", lambda *args: None)
+
+    ctx = asyncio.run(run_queued_past_auto_defer(wikidot_scraper.WikidotExtension.spell_lookup, "fireball"))
+    assert ctx.sent == [(None, {"embeds": "fireball card"})]
+
+
+def test_errors_after_auto_defer_stay_ephemeral(monkeypatch):
+    monkeypatch.setattr(admission, "CONTROLLER", AdmissionController())
+
+    ctx = asyncio.run(run_queued_past_auto_defer(wikidot_scraper.WikidotExtension.spell_compare, " , "))
+    assert ctx.deleted_original
+    assert len(ctx.sent) == 1
+    assert ctx.sent[0][1] == {"ephemeral": True}
@@ -0,0 +1,43 @@
+import logging
+
+from bot_logging import DebugRateLimitFilter, StructuredFormatter, fields
+
+
+def make_record(message: str, level: int = logging.INFO, extra: dict = None) -> logging.LogRecord:
+    record = logging.LogRecord("wikidot_scraper", level, __file__, 1, message, None, None)
+    for key, value in (extra or {}).items():
+        setattr(record, key, value)
+    return record
+
+
+def test_structured_formatter_appends_fields():
+    record = make_record("Command completed", extra=fields(command="spell_lookup", latency_ms=42))
+    assert StructuredFormatter().format(record) == \
+        "INFO wikidot_scraper: Command completed command=spell_lookup latency_ms=42"
+
+
+def test_structured_formatter_quotes_values_with_spaces():
+    record = make_record("Lookup failed", extra=fields(name="magic missile"))
+    assert StructuredFormatter().format(record).endswith("name='magic missile'")
+
+
+def test_structured_formatter_without_fields():
+    assert StructuredFormatter().format(make_record("Ready")) == "INFO wikidot_scraper: Ready"
+
+
+def test_debug_rate_limit_filter_limits_each_message_per_window(clock):
+    rate_limit_filter = DebugRateLimitFilter(limit=2, window=60)
+    debug_record = make_record("Fetching %s", level=logging.DEBUG)
+    other_record = make_record("Parsing %s", level=logging.DEBUG)
+
+    assert [rate_limit_filter.filter(debug_record) for _ in range(3)] == [True, True, False]
+    assert rate_limit_filter.filter(other_record)
+
+    clock.advance(60)
+    assert rate_limit_filter.filter(debug_record)
+
+
+def test_debug_rate_limit_filter_passes_other_levels(clock):
+    rate_limit_filter = DebugRateLimitFilter(limit=1, window=60)
+    record = make_record("Reminder sent", level=logging.INFO)
+    assert all(rate_limit_filter.filter(record) for _ in range(5))
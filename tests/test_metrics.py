@@ -0,0 +1,66 @@
+import pytest
+
+from metrics import Histogram, MetricsRegistry, render_histogram
+
+
+def test_histogram_counts_values_into_buckets():
+    histogram = Histogram(buckets=(0.1, 1.0, float('inf')))
+    for value in [0.05, 0.1, 0.5, 3.0]:
+        histogram.observe(value)
+
+    assert histogram.bucket_counts == [2, 1, 1]
+    assert histogram.count == 4
+    assert histogram.max == 3.0
+    assert histogram.mean() == pytest.approx(0.9125)
+
+
+def test_histogram_quantiles_use_bucket_bounds_capped_at_max():
+    histogram = Histogram(buckets=(0.1, 1.0, float('inf')))
+    for value in [0.05] * 90 + [0.5] * 9 + [3.0]:
+        histogram.observe(value)
+
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.95) == 1.0
+    assert histogram.quantile(1.0) == 3.0
+
+
+def test_empty_histogram():
+    histogram = Histogram()
+    assert histogram.mean() == 0.0
+    assert histogram.quantile(0.99) == 0.0
+
+
+def test_render_histogram_is_cumulative():
+    histogram = Histogram(buckets=(0.1, float('inf')))
+    histogram.observe(0.05)
+    histogram.observe(2.0)
+
+    assert render_histogram("latency", 'command="roll"', histogram) == [
+        'latency_bucket{command="roll",le="0.1"} 1',
+        'latency_bucket{command="roll",le="+Inf"} 2',
+        'latency_sum{command="roll"} 2.050000',
+        'latency_count{command="roll"} 2',
+    ]
+
+
+def test_registry_rates():
+    registry = MetricsRegistry()
+    registry.observe_upstream("wikidot", 0.2)
+    registry.observe_upstream("wikidot", 5.0, failed=True)
+    registry.record_cache("pages", hit=True)
+    registry.record_cache("pages", hit=True)
+    registry.record_cache("pages", hit=False)
+
+    assert registry.upstream_error_rate("wikidot") == 0.5
+    assert registry.upstream_error_rate("calendar") == 0.0
+    assert registry.cache_hit_ratio("pages") == pytest.approx(2 / 3)
+
+
+def test_registry_renders_gauges_and_skips_failing_ones():
+    registry = MetricsRegistry()
+    registry.gauges["fcg_ok"] = lambda: 3
+    registry.gauges["fcg_broken"] = lambda: 1 / 0
+
+    text = registry.render_text()
+    assert "fcg_ok 3\n" in text
+    assert "fcg_broken" not in text
@@ -0,0 +1,57 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import polls
+from polls import PollError
+
+
+class FakeChannel:
+    def __init__(self):
+        self.id = 1
+        self.history_calls = []
+
+    def history(self, **kwargs):
+        self.history_calls.append(kwargs)
+
+        async def flatten():
+            return []
+
+        return SimpleNamespace(flatten=flatten)
+
+
+class FakeSharedCache:
+    def __init__(self, registered_poll):
+        self.registered_poll = registered_poll
+
+    async def get_poll(self, thread_id):
+        return self.registered_poll
+
+
+def make_context(channel: FakeChannel) -> SimpleNamespace:
+    async def send(content=None, **kwargs):
+        pass
+
+    return SimpleNamespace(channel=channel, client=SimpleNamespace(user="bot"), deferred=False, responded=False,
+                           ephemeral=False, send=send)
+
+
+def test_multipoll_rejects_polls_without_options():
+    with pytest.raises(PollError):
+        asyncio.run(polls.multipoll(None, "Which day?", "   "))
+
+
+def test_find_multipoll_fetches_only_registered_options(monkeypatch):
+    monkeypatch.setattr(polls, "SHARED_CACHE", FakeSharedCache(("100", 3)))
+    channel = FakeChannel()
+    asyncio.run(polls.find_multipoll(make_context(channel)))
+    assert channel.history_calls == [{"limit": 3, "before": "100"}]
+
+
+def test_find_multipoll_scans_for_polls_registered_without_options(monkeypatch):
+    monkeypatch.setattr(polls, "SHARED_CACHE", FakeSharedCache(("100", 0)))
+    channel = FakeChannel()
+    asyncio.run(polls.find_multipoll(make_context(channel)))
+    # A limit of 0 would fetch the whole history.
+    assert channel.history_calls == [{"limit": 200}]
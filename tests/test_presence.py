@@ -0,0 +1,57 @@
+from datetime import datetime, time, timedelta
+
+from interactions import ActivityType
+
+from presence import DEFAULT_PRESENCE, PRESENCE_TIMEZONE, PresenceRule, get_active_rule, get_next_transition
+
+# A Thursday.
+THURSDAY = datetime(2026, 10, 22)
+THURSDAY_NIGHT = PresenceRule(weekdays=[3], start=time(18), end=None, name="Stream",
+                              activity_type=ActivityType.STREAMING)
+WEEKDAY_MORNINGS = PresenceRule(weekdays=list(range(5)), start=time(8), end=time(12), name="Work",
+                                activity_type=ActivityType.GAME)
+
+
+def local(day: datetime, hour: int, minute: int = 0) -> datetime:
+    return PRESENCE_TIMEZONE.localize(day.replace(hour=hour, minute=minute))
+
+
+def test_rule_is_active_inside_its_window():
+    assert THURSDAY_NIGHT.is_active(local(THURSDAY, 18))
+    assert THURSDAY_NIGHT.is_active(local(THURSDAY, 23, 59))
+    assert not THURSDAY_NIGHT.is_active(local(THURSDAY, 17, 59))
+    assert not THURSDAY_NIGHT.is_active(local(THURSDAY + timedelta(days=1), 0))
+
+
+def test_window_end_is_exclusive():
+    assert WEEKDAY_MORNINGS.is_active(local(THURSDAY, 11, 59))
+    assert not WEEKDAY_MORNINGS.is_active(local(THURSDAY, 12))
+
+
+def test_first_active_rule_wins_and_default_applies_otherwise():
+    rules = [THURSDAY_NIGHT, DEFAULT_PRESENCE]
+    assert get_active_rule(local(THURSDAY, 20), [THURSDAY_NIGHT]) is THURSDAY_NIGHT
+    assert get_active_rule(local(THURSDAY, 20), list(reversed(rules))) is DEFAULT_PRESENCE
+    assert get_active_rule(local(THURSDAY, 10), [THURSDAY_NIGHT]) is DEFAULT_PRESENCE
+
+
+def test_next_transition_is_the_next_window_boundary():
+    assert get_next_transition(local(THURSDAY, 10), [THURSDAY_NIGHT]) == local(THURSDAY, 18)
+    assert get_next_transition(local(THURSDAY, 20), [THURSDAY_NIGHT]) == local(THURSDAY + timedelta(days=1), 0)
+    assert get_next_transition(local(THURSDAY, 10), [THURSDAY_NIGHT, WEEKDAY_MORNINGS]) == local(THURSDAY, 12)
+
+
+def test_next_transition_wraps_to_the_following_week():
+    friday = THURSDAY + timedelta(days=1)
+    assert get_next_transition(local(friday, 10), [THURSDAY_NIGHT]) == local(THURSDAY + timedelta(days=7), 18)
+
+
+def test_next_transition_is_exact_across_daylight_saving_changes():
+    # US/Pacific leaves daylight saving time on Sunday 2026-11-01.
+    after_change = get_next_transition(local(THURSDAY + timedelta(days=8), 10), [THURSDAY_NIGHT])
+    assert after_change == local(THURSDAY + timedelta(days=14), 18)
+    assert after_change.utcoffset() == timedelta(hours=-8)
+
+
+def test_no_rules_means_no_transition():
+    assert get_next_transition(local(THURSDAY, 10), []) is None
@@ -0,0 +1,95 @@
+from os import linesep
+from types import SimpleNamespace
+
+from spell_index import SpellIndex, SpellRecord, tokenize
+
+
+def make_record(name: str, text: str, level: int = 1, school: str = "evocation", classes: [str] = ("Wizard",),
+                components: [str] = ("V", "S")) -> SpellRecord:
+    return SpellRecord(name=name, classification=f"level {level} {school}", level=level, school=school,
+                       classes=list(classes), components=list(components), text=text)
+
+
+def make_index() -> SpellIndex:
+    index = SpellIndex()
+    index.add(make_record("Fireball", "A bright streak of fire explodes into flame.", level=3))
+    index.add(make_record("Fire Bolt", "You hurl a mote of fire.", level=0, classes=["Sorcerer", "Wizard"]))
+    index.add(make_record("Cure Wounds", "A creature you touch regains hit points.", school="abjuration",
+                          classes=["Cleric"]))
+    index.add(make_record("Shield", "An invisible barrier of magical force appears.", school="abjuration",
+                          components=["V", "S", "M"]))
+    return index
+
+
+def names(records: [SpellRecord]) -> [str]:
+    return [record.name for record in records]
+
+
+def test_tokenize_drops_stop_words_and_punctuation():
+    assert tokenize("The caster's Fire, and the flame!") == ["caster's", "fire", "flame"]
+
+
+def test_name_matches_rank_above_description_matches():
+    index = make_index()
+    index.add(make_record("Flame Strike", "A vertical column of divine fire roars down."))
+    assert names(index.search("flame"))[0] == "Flame Strike"
+
+
+def test_prefix_terms_match_longer_indexed_terms():
+    assert names(make_index().search("firebal")) == ["Fireball"]
+    assert make_index().search("fi") == []
+
+
+def test_search_applies_filters():
+    index = make_index()
+    assert names(index.search("fire", level=0)) == ["Fire Bolt"]
+    assert names(index.search("fire", spell_class="sorcerer")) == ["Fire Bolt"]
+    assert names(index.search("", school="abjuration", components=["V", "S"])) == ["Cure Wounds"]
+
+
+def test_empty_query_lists_matches_by_name():
+    assert names(make_index().search("", limit=3)) == ["Cure Wounds", "Fire Bolt", "Fireball"]
+
+
+def test_readding_a_spell_replaces_its_terms():
+    index = make_index()
+    index.add(make_record("Shield", "A shimmering ward."))
+    assert len(index) == 4
+    assert index.search("barrier") == []
+    assert names(index.search("ward")) == ["Shield"]
+    assert "shield" in index
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "spell_index.json")
+    make_index().save(path)
+
+    loaded_index = SpellIndex()
+    loaded_index.load(path)
+    assert len(loaded_index) == 4
+    assert names(loaded_index.search("flame")) == ["Fireball"]
+
+
+def test_load_ignores_missing_and_corrupt_files(tmp_path):
+    index = SpellIndex()
+    index.load(str(tmp_path / "missing.json"))
+    corrupt_path = tmp_path / "corrupt.json"
+    corrupt_path.write_text("{not json")
+    index.load(str(corrupt_path))
+    assert len(index) == 0
+
+
+def test_record_from_spell():
+    spell = SimpleNamespace(
+        name="_Fireball_",
+        classification="*3rd-level evocation*",
+        spell_lists="***Spell Lists.*** Sorcerer, Wizard",
+        components="**Components:** V, S, M (a tiny ball of bat guano and sulfur)",
+        description_lines=["A bright streak flashes."],
+        extra_lines=[],
+    )
+    record = SpellRecord.from_spell(spell)
+    assert (record.name, record.level, record.school) == ("Fireball", 3, "evocation")
+    assert record.classes == ["Sorcerer", "Wizard"]
+    assert record.components == ["V", "S", "M"]
+    assert record.text == linesep.join(["A bright streak flashes."])
@@ -0,0 +1,113 @@
+from utils import CircuitBreaker, TtlCache
+
+
+def test_ttl_cache_expires_entries(clock):
+    cache = TtlCache(ttl=10, max_entries=5)
+    cache.put("fireball", "text")
+    clock.advance(9)
+    assert cache.get("fireball") == "text"
+    clock.advance(1)
+    assert cache.get("fireball") is None
+    assert "fireball" not in cache
+
+
+def test_ttl_cache_serves_stale_entries_on_request(clock):
+    cache = TtlCache(ttl=10, max_entries=5)
+    cache.put("fireball", "text")
+    clock.advance(60)
+    assert cache.get("fireball", allow_stale=True) == "text"
+
+
+def test_ttl_cache_per_entry_ttl(clock):
+    cache = TtlCache(ttl=10, max_entries=5)
+    cache.put("fireball", "text", ttl=2)
+    clock.advance(2)
+    assert cache.get("fireball") is None
+
+
+def test_ttl_cache_evicts_least_recently_used(clock):
+    cache = TtlCache(ttl=10, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert len(cache) == 2
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_pop(clock):
+    cache = TtlCache(ttl=10, max_entries=2)
+    cache.put("a", 1)
+    cache.pop("a")
+    cache.pop("missing")
+    assert cache.get("a") is None
+
+
+def test_circuit_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, base_backoff=10, max_backoff=300)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.is_open()
+    assert not breaker.allow_request()
+
+
+def test_circuit_breaker_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert not breaker.is_open()
+
+
+def test_circuit_breaker_allows_one_trial_after_backoff(clock):
+    breaker = CircuitBreaker(failure_threshold=1, base_backoff=10, max_backoff=300)
+    breaker.record_failure()
+    clock.advance(10)
+    assert breaker.allow_request()
+    # Other requests wait for the trial's result.
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert not breaker.is_open()
+    assert breaker.allow_request()
+
+
+def test_circuit_breaker_failed_trials_double_backoff_up_to_max(clock):
+    breaker = CircuitBreaker(failure_threshold=1, base_backoff=10, max_backoff=30)
+    breaker.record_failure()
+
+    for expected_backoff in [20, 30, 30]:
+        clock.advance(breaker.open_until - clock.now)
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.backoff == expected_backoff
+        clock.advance(expected_backoff - 1)
+        assert not breaker.allow_request()
+        clock.advance(1)
+
+    breaker.record_success()
+    assert breaker.backoff == 10
+
+
+def test_circuit_breaker_ignores_failures_in_flight_when_it_opened(clock):
+    breaker = CircuitBreaker(failure_threshold=3, base_backoff=10, max_backoff=300)
+    # A burst of failures from concurrent requests only opens the circuit once.
+    for _ in range(8):
+        breaker.record_failure()
+    assert breaker.is_open()
+    assert breaker.backoff == 10
+    assert breaker.open_until == clock.now + 10
+
+    clock.advance(10)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.backoff == 20
+    # Late failures while the circuit is open again don't count as more failed trials.
+    breaker.record_failure()
+    assert breaker.backoff == 20
@@ -0,0 +1,149 @@
+import asyncio
+from os import linesep
+
+import pytest
+
+import wikidot_scraper
+from wikidot_scraper import DndItem, WikidotPageNotFound, WikidotUnavailable, get_item_category_candidates, \
+    resolve_item_text
+
+
+class FakeSharedCache:
+    def __init__(self):
+        self.item_categories = {}
+
+    async def get_item_category(self, name: str):
+        return self.item_categories.get(name)
+
+    def put_item_category(self, name: str, category: str):
+        self.item_categories[name] = category
+
+    def remove_item_category(self, name: str):
+        self.item_categories.pop(name, None)
+
+
+class FakeWikidot:
+    """
+    Serves page text by path after a delay. Paths without a page are not found.
+    """
+    def __init__(self, pages: dict[str, str], errors: dict[str, Exception] = None, delays: dict[str, float] = None):
+        self.pages = pages
+        self.errors = errors or {}
+        self.delays = delays or {}
+        self.requested_paths = []
+        self.cancelled_paths = []
+
+    async def fetch_wikidot_page_text(self, page_path: str) -> str:
+        self.requested_paths.append(page_path)
+        try:
+            await asyncio.sleep(self.delays.get(page_path, 0))
+        except asyncio.CancelledError:
+            self.cancelled_paths.append(page_path)
+            raise
+        if page_path in self.errors:
+            raise self.errors[page_path]
+        if page_path not in self.pages:
+            raise WikidotPageNotFound(f"No page at {page_path}")
+        return self.pages[page_path]
+
+
+@pytest.fixture
+def shared_cache(monkeypatch) -> FakeSharedCache:
+    fake_shared_cache = FakeSharedCache()
+    monkeypatch.setattr(wikidot_scraper, "SHARED_CACHE", fake_shared_cache)
+    monkeypatch.setattr(wikidot_scraper, "item_category_by_name", {})
+    return fake_shared_cache
+
+
+def use_wikidot(monkeypatch, wikidot: FakeWikidot) -> FakeWikidot:
+    monkeypatch.setattr(wikidot_scraper, "fetch_wikidot_page_text", wikidot.fetch_wikidot_page_text)
+    return wikidot
+
+
+def test_item_category_candidates_put_hinted_categories_first():
+    assert get_item_category_candidates("Ring of Protection") == \
+        ["Rings", "Wondrous Items", "Armor", "Weapons", "Potions", "Rods", "Scrolls", "Staffs", "Wands"]
+    assert get_item_category_candidates("Flame Tongue Longsword")[0] == "Weapons"
+    assert get_item_category_candidates("Potion of Fire-Breath")[0] == "Potions"
+
+
+def test_item_category_candidates_without_hints_keep_category_order():
+    assert get_item_category_candidates("Bag of Holding") == wikidot_scraper.ITEM_CATEGORIES
+
+
+def make_item_text(metadata: str) -> str:
+    return linesep.join(["Dragon Scale Mail", "Source: Dungeon Master's Guide", "", f"*{metadata}*",
+                         "You gain advantage on saving throws against dragons."])
+
+
+def test_item_metadata_keeps_commas_inside_qualified_types():
+    item = DndItem(make_item_text("Armor (medium or heavy, but not hide), rare"))
+    assert item.item_type == "Armor (medium or heavy, but not hide)"
+    assert item.rarity.strip() == "rare"
+    assert item.attunement is None
+
+
+def test_item_metadata_reads_attunement():
+    item = DndItem(make_item_text("Weapon (any sword), very rare (requires attunement by a paladin)"))
+    assert item.item_type == "Weapon (any sword)"
+    assert item.rarity.strip() == "very rare"
+    assert item.attunement == "requires attunement by a paladin"
+
+
+def test_item_type_images_ignore_qualifiers():
+    assert DndItem(make_item_text("Weapon (any sword), rare")).get_item_type_image_url() == \
+        DndItem.ITEM_TYPE_TO_IMAGE_MAP['weapon']
+    assert DndItem(make_item_text("Gizmo, rare")).get_item_type_image_url() == \
+        DndItem.ITEM_TYPE_TO_IMAGE_MAP['wondrous item']
+
+
+def test_split_metadata_without_commas():
+    assert DndItem.split_metadata("Wondrous item") == ("Wondrous item", "")
+
+
+def test_resolve_item_tries_likeliest_category_alone(monkeypatch, shared_cache):
+    wikidot = use_wikidot(monkeypatch, FakeWikidot({"rings:ring-of-protection": "ring text"}))
+    assert asyncio.run(resolve_item_text("Ring of Protection")) == "ring text"
+    assert wikidot.requested_paths == ["rings:ring-of-protection"]
+    assert shared_cache.item_categories == {"ring-of-protection": "Rings"}
+
+
+def test_resolve_item_first_page_found_wins(monkeypatch, shared_cache):
+    wikidot = use_wikidot(monkeypatch, FakeWikidot(
+        {"armor:bag-of-holding": "armor text", "rings:bag-of-holding": "ring text"},
+        delays={"armor:bag-of-holding": 1, "weapons:bag-of-holding": 1, "rings:bag-of-holding": 0.01}))
+    assert asyncio.run(resolve_item_text("Bag of Holding")) == "ring text"
+    # After the first category misses, the next MAX_CONCURRENT_ITEM_CATEGORY_REQUESTS are requested at once, and the
+    # ones still running when a page is found are cancelled.
+    assert wikidot.requested_paths == ["wondrous-items:bag-of-holding", "armor:bag-of-holding",
+                                       "weapons:bag-of-holding", "rings:bag-of-holding"]
+    assert sorted(wikidot.cancelled_paths) == ["armor:bag-of-holding", "weapons:bag-of-holding"]
+    assert shared_cache.item_categories == {"bag-of-holding": "Rings"}
+
+
+def test_resolve_item_ignores_errors_when_another_category_has_the_page(monkeypatch, shared_cache):
+    use_wikidot(monkeypatch, FakeWikidot({"armor:bag-of-tricks": "armor text"},
+                                         errors={"wondrous-items:bag-of-tricks": WikidotUnavailable()}))
+    assert asyncio.run(resolve_item_text("Bag of Tricks")) == "armor text"
+
+
+def test_resolve_item_raises_lookup_errors_over_not_found(monkeypatch, shared_cache):
+    use_wikidot(monkeypatch, FakeWikidot({}, errors={"armor:bag-of-nothing": WikidotUnavailable()}))
+    with pytest.raises(WikidotUnavailable):
+        asyncio.run(resolve_item_text("Bag of Nothing"))
+    assert not shared_cache.item_categories
+
+
+def test_resolve_item_not_found_in_any_category(monkeypatch, shared_cache):
+    wikidot = use_wikidot(monkeypatch, FakeWikidot({}))
+    with pytest.raises(WikidotPageNotFound):
+        asyncio.run(resolve_item_text("Bag of Nothing"))
+    assert len(wikidot.requested_paths) == len(wikidot_scraper.ITEM_CATEGORIES)
+
+
+def test_resolve_item_falls_back_when_remembered_category_moved(monkeypatch, shared_cache):
+    shared_cache.item_categories["cloak-of-elvenkind"] = "Armor"
+    wikidot = use_wikidot(monkeypatch, FakeWikidot({"wondrous-items:cloak-of-elvenkind": "cloak text"}))
+    assert asyncio.run(resolve_item_text("Cloak of Elvenkind")) == "cloak text"
+    assert wikidot.requested_paths[:2] == ["armor:cloak-of-elvenkind", "wondrous-items:cloak-of-elvenkind"]
+    assert shared_cache.item_categories == {"cloak-of-elvenkind": "Wondrous Items"}